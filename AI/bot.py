@@ -1,14 +1,25 @@
 
+import asyncio
+from functools import lru_cache
+
 from langchain_groq import ChatGroq
 from langchain.agents import create_agent
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
-from AI.rag import make_query_rag_tool
-from AI.tools import universal_tools
+from AI.rag import query_rag, ConversationContext
+from AI.tools import get_universal_tools
+from AI.resilience import ToolGuardMiddleware
+from AI.llm_scheduler import LLMSchedulerMiddleware, scheduled_invoke, BACKGROUND
+from AI.context import truncate_tokens
 
 from database.initializations import MessageModel
+from utils.config import AGENT_TURN_TIMEOUT_SECONDS, AGENT_FALLBACK_TIMEOUT_SECONDS, SUMMARY_MESSAGE_MAX_TOKENS
+from utils.tracing import span
 
-llm = ChatGroq(model="moonshotai/kimi-k2-instruct-0905", temperature=0.2)
+@lru_cache(maxsize=None)
+def get_llm() -> ChatGroq:
+    # Retries (429s and transient errors) belong to the LLM scheduler, so the client itself never retries
+    return ChatGroq(model="moonshotai/kimi-k2-instruct-0905", temperature=0.2, max_retries=0)
 
 system_prompt = SystemMessage(
     content="""You are a helpful and knowledgeable AI assistant with access to real-time web search and the user's personal knowledge base.
@@ -28,28 +39,150 @@ When to use your tools:
 Always prioritize accuracy and cite your sources when making factual claims."""
 )
 
+@lru_cache(maxsize=None)
+def get_agent():
+    """Compiled once per process; the conversation id reaches query_rag through the run context"""
+    return create_agent(
+        model=get_llm(),
+        tools=get_universal_tools() + [query_rag],
+        context_schema=ConversationContext,
+        middleware=[ToolGuardMiddleware(), LLMSchedulerMiddleware()]
+    )
+
+class AgentUnavailable(Exception):
+    """Neither the agent nor the tool-less fallback produced an answer in time"""
+
+fallback_note = SystemMessage(
+    content="Web search and the knowledge base are unavailable for this reply. Answer from what you already know and say briefly that you could not look anything up."
+)
+
+async def fallback_answer(full_history: list, user: str) -> str:
+    """Answer with the bare model when the agent run fails or runs out of time"""
+    try:
+        response = await asyncio.wait_for(
+            scheduled_invoke(get_llm(), full_history[:1] + [fallback_note] + full_history[1:], user=user, kind="fallback"),
+            AGENT_FALLBACK_TIMEOUT_SECONDS
+        )
+    except Exception as e:
+        raise AgentUnavailable(repr(e)) from e
+    return response.content
+
+summary_prompt = """You maintain a running summary of a conversation between a user and an AI assistant.
+Merge the new messages into the existing summary. Keep names, numbers, decisions, open questions and user preferences; drop pleasantries.
+Write plain prose, at most 250 words. Reply with the summary only."""
+
+def build_history(user_message: str, messages: list, summary: str | None = None) -> list:
+    """System prompt, rolling summary, budgeted history and the new message"""
+    history = [system_prompt]
+    if summary:
+        history.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+    return history + db_to_langchain(messages=messages) + [HumanMessage(content=user_message)]
+
+async def summarize_messages(previous_summary: str | None, messages: list, user: str) -> str:
+    """Fold messages into the rolling conversation summary"""
+    # Long messages (pasted documents) are cut so one summarization call stays bounded
+    transcript = "\n".join(
+        f"{message.role}: {truncate_tokens(message.content, SUMMARY_MESSAGE_MAX_TOKENS)}" for message in messages
+    )
+    response = await scheduled_invoke(get_llm(), [
+        SystemMessage(content=summary_prompt),
+        HumanMessage(content=f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}")
+    ], user=user, priority=BACKGROUND, kind="summary")
+    return response.content.strip()
+
 async def get_ai_response(
     user_message: str,
     conversation_id: int,
-    messages: list
+    messages: list,
+    summary: str | None = None,
+    user_id=None
 ) -> str:
     """Get AI response with tools"""
 
-    chat_history = db_to_langchain(messages=messages)
-    query = make_query_rag_tool(conversation_id=conversation_id)
-    all_tools = universal_tools + [query]
-    agent = create_agent(model=llm, tools=all_tools)
-    full_history = [system_prompt] + chat_history + [HumanMessage(content=user_message)]  
+    context = ConversationContext(conversation_id=str(conversation_id), user_id=str(user_id) if user_id else None)
+    full_history = build_history(user_message, messages, summary)
     try:
-        response = await agent.ainvoke({"messages": full_history}, config={
-        "recursion_limit": 10,
-        "return_intermediate_steps": True
-    })
+        with span("agent.run", conversation_id=context.conversation_id, mode="sync", history_messages=len(full_history)):
+            response = await asyncio.wait_for(get_agent().ainvoke({"messages": full_history}, config={
+            "recursion_limit": 10,
+            "return_intermediate_steps": True
+        }, context=context), AGENT_TURN_TIMEOUT_SECONDS)
         ai_message_content = response["messages"][-1].content
         return ai_message_content
     except Exception as e:
-        return f"I encountered an error: {str(e)}"
-    
+        print("Agent run failed, answering without tools:", repr(e))
+        return await fallback_answer(full_history, context.user_id or context.conversation_id)
+
+async def stream_ai_response(
+    user_message: str,
+    conversation_id: int,
+    messages: list,
+    summary: str | None = None,
+    user_id=None
+):
+    """Stream AI response events (tokens, tool calls) as the agent runs; a reset event
+    means the text streamed so far is dropped and a new answer follows"""
+
+    context = ConversationContext(conversation_id=str(conversation_id), user_id=str(user_id) if user_id else None)
+    full_history = build_history(user_message, messages, summary)
+    events = asyncio.Queue()
+    answer = ""
+
+    async def run_agent():
+        nonlocal answer
+        try:
+            with span("agent.run", conversation_id=context.conversation_id, mode="stream", history_messages=len(full_history)):
+                async for event in get_agent().astream_events({"messages": full_history}, config={
+                    "recursion_limit": 10
+                }, version="v2", context=context):
+                    kind = event["event"]
+                    if kind == "on_chat_model_start":
+                        # Only the last model call carries the final answer, and only that is saved;
+                        # text streamed before a tool call is withdrawn so the client matches what is stored
+                        if answer:
+                            await events.put({"type": "reset"})
+                        answer = ""
+                    elif kind == "on_chat_model_stream":
+                        token = event["data"]["chunk"].text
+                        if token:
+                            answer += token
+                            await events.put({"type": "token", "content": token})
+                    elif kind == "on_tool_start":
+                        await events.put({"type": "tool_start", "name": event["name"], "run_id": event["run_id"]})
+                    elif kind == "on_tool_end":
+                        await events.put({"type": "tool_end", "name": event["name"], "run_id": event["run_id"]})
+            await events.put(None)
+        except Exception as e:
+            await events.put(e)
+
+    # The agent runs in its own task so the turn deadline can stop it between any two events
+    agent_task = asyncio.create_task(run_agent())
+    deadline = asyncio.get_running_loop().time() + AGENT_TURN_TIMEOUT_SECONDS
+    try:
+        while True:
+            remaining = deadline - asyncio.get_running_loop().time()
+            event = await asyncio.wait_for(events.get(), max(remaining, 0))
+            if event is None:
+                break
+            if isinstance(event, Exception):
+                raise event
+            yield event
+    except Exception as e:
+        agent_task.cancel()
+        print("Agent run failed, answering without tools:", repr(e))
+        # Tells the client to discard any partial text it has shown
+        yield {"type": "fallback"}
+        try:
+            answer = await fallback_answer(full_history, context.user_id or context.conversation_id)
+        except AgentUnavailable:
+            yield {"type": "error", "content": "The assistant is unavailable right now, please try again."}
+            answer = None
+        else:
+            yield {"type": "token", "content": answer}
+    finally:
+        agent_task.cancel()
+    yield {"type": "final", "content": answer}
+
 def db_to_langchain(messages: list[MessageModel]):
     chat_history = []
     for message in messages:
@@ -0,0 +1,65 @@
+
+from functools import lru_cache
+
+from utils.config import CONTEXT_TOKEN_BUDGET, TOKENIZER_ENCODING
+
+# Role markers and separators the chat template adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        # tiktoken downloads its tables on first use; estimate when that is not possible
+        print("Token counting falls back to estimates:", repr(e))
+        return None
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens]) + " [...]"
+
+def message_tokens(message) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+def fit_history(messages: list, summary: str | None = None, user_message: str = "", budget: int = CONTEXT_TOKEN_BUDGET):
+    """Split chronological messages into (overflow, window): the newest ones that fit the token budget, and the rest"""
+    remaining = budget - count_tokens(user_message)
+    if summary:
+        remaining -= count_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+
+    start = len(messages)
+    while start > 0:
+        cost = message_tokens(messages[start - 1])
+        if cost > remaining:
+            break
+        remaining -= cost
+        start -= 1
+
+    # Open the window on a user turn, and never split rows sharing a timestamp across the summary boundary
+    while 0 < start < len(messages) and (
+        messages[start].role != "user" or messages[start - 1].created_at == messages[start].created_at
+    ):
+        start += 1
+    return messages[:start], messages[start:]
+
+def split_recent(messages: list, max_tokens: int, cost=message_tokens) -> tuple[list, list]:
+    """Split into (skipped, kept): the newest messages within max_tokens, never splitting same-timestamp rows"""
+    start, tokens = len(messages), 0
+    while start > 0 and tokens + cost(messages[start - 1]) <= max_tokens:
+        tokens += cost(messages[start - 1])
+        start -= 1
+    while 0 < start < len(messages) and messages[start - 1].created_at == messages[start].created_at:
+        start += 1
+    return messages[:start], messages[start:]
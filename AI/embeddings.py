@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+from utils.metrics import EMBEDDING_SECONDS
+from utils.tracing import span
+from utils.config import EMBEDDING_MODEL, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed cache in front of an embedder: in-memory LRU, then SQLite, then the model."""
+
+    def __init__(self, underlying: Embeddings, model_name: str, max_size: int, path: str | None):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_size = max_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self.db.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: list[float]):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+            self.stats["memory_hits"] += len(found)
+
+            remaining = [key for key in keys if key not in found]
+            if self.db is not None:
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(remaining), 500):
+                    chunk = remaining[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self.db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = array("f", blob).tolist()
+                        found[key] = vector
+                        self._remember(key, vector)
+                    self.stats["disk_hits"] += len(rows)
+        return found
+
+    def _store(self, items: dict[str, list[float]]):
+        with self.lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self.db is not None and items:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array("f", vector).tobytes()) for key, vector in items.items()]
+                )
+                self.db.commit()
+
+    def _missing(self, texts: list[str], keys: list[str], found: dict) -> dict[str, str]:
+        # Dedupe so repeated chunks in one batch are embedded once
+        missing = {}
+        for text, key in zip(texts, keys):
+            if key not in found and key not in missing:
+                missing[key] = text
+        with self.lock:
+            self.stats["misses"] += len(missing)
+        return missing
+
+    def _embed(self, texts: list[str], operation: str) -> list[list[float]]:
+        with span("embedding", operation=operation, texts=len(texts)) as trace_span:
+            keys = [self._key(text) for text in texts]
+            found = self._lookup(keys)
+            missing = self._missing(texts, keys, found)
+            if trace_span is not None:
+                trace_span.set(computed=len(missing))
+            if missing:
+                started = time.perf_counter()
+                vectors = self.underlying.embed_documents(list(missing.values()))
+                EMBEDDING_SECONDS.labels(operation).observe(time.perf_counter() - started)
+                computed = dict(zip(missing.keys(), vectors))
+                self._store(computed)
+                found.update(computed)
+            return [found[key] for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(texts, "documents")
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text], "query")[0]
+
+    async def _aembed(self, texts: list[str], operation: str) -> list[list[float]]:
+        with span("embedding", operation=operation, texts=len(texts)) as trace_span:
+            keys = [self._key(text) for text in texts]
+            found = await asyncio.to_thread(self._lookup, keys)
+            missing = self._missing(texts, keys, found)
+            if trace_span is not None:
+                trace_span.set(computed=len(missing))
+            if missing:
+                started = time.perf_counter()
+                vectors = await self.underlying.aembed_documents(list(missing.values()))
+                EMBEDDING_SECONDS.labels(operation).observe(time.perf_counter() - started)
+                computed = dict(zip(missing.keys(), vectors))
+                await asyncio.to_thread(self._store, computed)
+                found.update(computed)
+            return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._aembed(texts, "documents")
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self._aembed([text], "query"))[0]
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+embeddings = CachedEmbeddings(
+    underlying=EMBEDDING_MODEL,
+    model_name=EMBEDDING_MODEL.model,
+    max_size=EMBEDDING_CACHE_SIZE,
+    path=EMBEDDING_CACHE_PATH
+)
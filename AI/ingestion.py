@@ -0,0 +1,91 @@
+import asyncio
+from uuid import UUID
+
+from AI.rag import add_to_rag
+from database.jobs import update_ingestion_job, heartbeat_worker, retire_worker, fail_interrupted_jobs
+from utils.metrics import INGESTION_JOBS, INGESTION_JOB_SECONDS
+from utils.tracing import trace, current_trace_id
+from utils.config import INGEST_WORKERS, INGEST_QUEUE_SIZE, INGEST_HEARTBEAT_SECONDS
+
+# Bounded so a burst of uploads cannot hold unlimited file bytes in memory
+_queue = None
+_workers = []
+
+class IngestionUnavailable(Exception):
+    """The job cannot be queued right now; the message is the reason stored on the job"""
+
+class IngestionQueueFull(IngestionUnavailable):
+    def __init__(self):
+        super().__init__("Ingestion queue is full")
+
+def enqueue_ingestion(job_id: UUID, conversation_id: UUID, file_bytes: bytes, filename: str):
+    # Before startup or after shutdown nothing would ever take the job off the queue
+    if _queue is None or not _workers:
+        raise IngestionUnavailable("Ingestion workers are not running")
+    try:
+        # Workers run outside the request's context, so the upload's trace travels with the job
+        _queue.put_nowait((job_id, conversation_id, file_bytes, filename, current_trace_id()))
+    except asyncio.QueueFull:
+        raise IngestionQueueFull()
+
+async def _run_job(job_id: UUID, conversation_id: UUID, file_bytes: bytes, filename: str, triggered_by: str | None):
+    await update_ingestion_job(job_id, state="running")
+
+    async def on_progress(done: int, total: int | None):
+        # The total is only known once parsing has finished
+        if total is None:
+            await update_ingestion_job(job_id, chunks_done=done)
+        else:
+            await update_ingestion_job(job_id, chunks_done=done, chunks_total=total)
+
+    try:
+        with trace(
+            "ingestion.job", triggered_by=triggered_by, job_id=str(job_id), filename=filename, size_bytes=len(file_bytes)
+        ), INGESTION_JOB_SECONDS.time():
+            result = await add_to_rag(conversation_id, file_bytes, filename, on_progress=on_progress)
+        await update_ingestion_job(job_id, state="succeeded", detail=result)
+        INGESTION_JOBS.labels("succeeded").inc()
+    except Exception as e:
+        print("RAG ERROR:", repr(e))
+        INGESTION_JOBS.labels("failed").inc()
+        await update_ingestion_job(job_id, state="failed", detail="Failed to add document")
+
+async def _worker():
+    while True:
+        job = await _queue.get()
+        try:
+            await _run_job(*job)
+        except Exception as e:
+            print(f"Ingestion worker error for job {job[0]}: {e!r}")
+        finally:
+            _queue.task_done()
+
+async def _heartbeat():
+    # Keeps this process's jobs alive and fails the jobs of processes that stopped beating
+    while True:
+        try:
+            await heartbeat_worker()
+            failed = await fail_interrupted_jobs()
+            if failed:
+                print(f"Failed {failed} ingestion jobs left by a dead worker")
+        except Exception as e:
+            print(f"Ingestion heartbeat error: {e!r}")
+        await asyncio.sleep(INGEST_HEARTBEAT_SECONDS)
+
+def start_ingestion_workers():
+    global _queue
+    _queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    for _ in range(INGEST_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+    _workers.append(asyncio.create_task(_heartbeat()))
+
+async def stop_ingestion_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    # Jobs still queued here are lost with the process; the next sweep anywhere fails them
+    try:
+        await retire_worker()
+    except Exception as e:
+        print(f"Could not retire ingestion worker: {e!r}")
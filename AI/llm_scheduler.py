@@ -0,0 +1,224 @@
+
+import time
+import random
+import asyncio
+from collections import OrderedDict, deque
+
+from groq import APIConnectionError
+from langchain.agents.middleware import AgentMiddleware
+
+from AI.context import message_tokens
+from utils.metrics import LLM_CALL_SECONDS, LLM_QUEUE_SECONDS, LLM_TOKENS
+from utils.tracing import span
+from utils.config import (
+    GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE, LLM_OUTPUT_TOKEN_ESTIMATE,
+    LLM_MAX_RETRIES, LLM_RETRY_BASE_DELAY, LLM_RETRY_JITTER_SECONDS
+)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+class TokenBucket:
+    """Refills continuously up to capacity; may go negative when actual usage beats the estimate"""
+
+    def __init__(self, capacity: float, per_second: float):
+        self.capacity = capacity
+        self.per_second = per_second
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.per_second)
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+def _status(error: Exception) -> int | None:
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+def _retry_after(error: Exception) -> float | None:
+    """Seconds to back off for a rate-limit error, None for anything else"""
+    if _status(error) != 429:
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        return float(headers["retry-after"])
+    except (KeyError, ValueError):
+        return LLM_RETRY_BASE_DELAY
+
+def _is_transient(error: Exception) -> bool:
+    """Timeouts, dropped connections, 408/409 and 5xx: worth retrying this call, no reason to slow the others"""
+    if isinstance(error, APIConnectionError):
+        return True
+    status = _status(error)
+    return status is not None and (status in (408, 409) or status >= 500)
+
+def estimate_tokens(messages: list) -> int:
+    return sum(message_tokens(message) for message in messages) + LLM_OUTPUT_TOKEN_ESTIMATE
+
+def _used_tokens(response) -> int | None:
+    # Agent middleware gets a ModelResponse, direct calls an AIMessage
+    messages = getattr(response, "result", None) or [response]
+    usage = getattr(messages[-1], "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+class LLMScheduler:
+    """Admits LLM calls within requests/min and tokens/min budgets.
+    Interactive calls go before background ones; within a priority, users take turns."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        # priority -> user -> waiting (future, estimated tokens, enqueued at)
+        self.queues = {INTERACTIVE: OrderedDict(), BACKGROUND: OrderedDict()}
+        self.paused_until = 0.0
+        self.wakeup = None
+        self.dispatcher = None
+        self.admitted = 0
+        self.rate_limited = 0
+        self.transient_retries = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def depth(self, priority: int) -> int:
+        return sum(len(waiting) for waiting in self.queues[priority].values())
+
+    def _next(self):
+        """Oldest waiter of the next user in line, highest priority first"""
+        for priority in (INTERACTIVE, BACKGROUND):
+            users = self.queues[priority]
+            while users:
+                user, waiting = next(iter(users.items()))
+                if waiting[0][0].cancelled():
+                    waiting.popleft()
+                    if not waiting:
+                        del users[user]
+                    continue
+                return priority, user
+        return None
+
+    async def _dispatch(self):
+        while True:
+            head = self._next()
+            if head is None:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            priority, user = head
+            future, estimate, enqueued = self.queues[priority][user][0]
+            delay = max(
+                self.paused_until - time.monotonic(),
+                self.requests.wait_time(1),
+                self.tokens.wait_time(estimate)
+            )
+            if delay > 0:
+                # Re-check after sleeping: a higher-priority call may have arrived meanwhile
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            waiting = self.queues[priority].pop(user)
+            waiting.popleft()
+            if waiting:
+                # Back of the line, so other users get a turn
+                self.queues[priority][user] = waiting
+            if future.cancelled():
+                continue
+            self.requests.take(1)
+            self.tokens.take(estimate)
+            waited = time.monotonic() - enqueued
+            self.admitted += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            LLM_QUEUE_SECONDS.labels(PRIORITY_NAMES[priority]).observe(waited)
+            future.set_result(None)
+
+    async def _admit(self, user: str, priority: int, estimate: int):
+        if self.dispatcher is None or self.dispatcher.done():
+            self.wakeup = asyncio.Event()
+            self.dispatcher = asyncio.create_task(self._dispatch())
+        future = asyncio.get_running_loop().create_future()
+        self.queues[priority].setdefault(user, deque()).append((future, estimate, time.monotonic()))
+        self.wakeup.set()
+        await future
+
+    async def run(self, call, *, user: str, priority: int, estimated_tokens: int, kind: str = "agent"):
+        """Run call() once admitted; on 429 the whole scheduler pauses for Retry-After plus jitter,
+        on a transient error only this call backs off exponentially"""
+        with span("llm.call", kind=kind, priority=PRIORITY_NAMES[priority], estimated_tokens=estimated_tokens) as trace_span:
+            queued = 0.0
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                enqueued = time.perf_counter()
+                await self._admit(user, priority, estimated_tokens)
+                started = time.perf_counter()
+                queued += started - enqueued
+                try:
+                    response = await call()
+                except Exception as e:
+                    LLM_CALL_SECONDS.labels(kind, "error").observe(time.perf_counter() - started)
+                    retry_after = _retry_after(e)
+                    if attempt == LLM_MAX_RETRIES or (retry_after is None and not _is_transient(e)):
+                        raise
+                    # Jitter keeps every waiting caller from hitting the provider in the same instant
+                    jitter = random.uniform(0, LLM_RETRY_JITTER_SECONDS)
+                    if retry_after is not None:
+                        self.rate_limited += 1
+                        self.paused_until = max(self.paused_until, time.monotonic() + retry_after + jitter)
+                    else:
+                        self.transient_retries += 1
+                        await asyncio.sleep(LLM_RETRY_BASE_DELAY * 2 ** attempt + jitter)
+                    continue
+                LLM_CALL_SECONDS.labels(kind, "ok").observe(time.perf_counter() - started)
+                used = _used_tokens(response)
+                if trace_span is not None:
+                    trace_span.set(attempts=attempt + 1, queue_wait_ms=round(queued * 1000, 3), total_tokens=used)
+                if used is not None:
+                    LLM_TOKENS.labels(kind).inc(used)
+                    # Charge what the call really cost, not the estimate
+                    self.tokens.take(used - estimated_tokens)
+                return response
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth_interactive": self.depth(INTERACTIVE),
+            "queue_depth_background": self.depth(BACKGROUND),
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "transient_retries": self.transient_retries,
+            "paused_seconds_remaining": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "wait_seconds_max": round(self.wait_seconds_max, 3)
+        }
+
+scheduler = LLMScheduler(GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE)
+
+async def scheduled_invoke(llm, messages: list, *, user: str, priority: int = INTERACTIVE, kind: str = "direct"):
+    """llm.ainvoke(messages) through the scheduler; kind only labels the latency metrics"""
+    return await scheduler.run(
+        lambda: llm.ainvoke(messages), user=user, priority=priority,
+        estimated_tokens=estimate_tokens(messages), kind=kind
+    )
+
+class LLMSchedulerMiddleware(AgentMiddleware):
+    """Routes every agent model call through the scheduler as interactive work"""
+
+    async def awrap_model_call(self, request, handler):
+        context = request.runtime.context
+        user = getattr(context, "user_id", None) or getattr(context, "conversation_id", None) or "anonymous"
+        messages = ([request.system_message] if request.system_message else []) + list(request.messages)
+        return await scheduler.run(
+            lambda: handler(request), user=user, priority=INTERACTIVE, estimated_tokens=estimate_tokens(messages)
+        )
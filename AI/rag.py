@@ -1,128 +1,222 @@
-import os
-import tempfile
-from uuid import uuid4
-
-from pinecone import Pinecone, ServerlessSpec
-from langchain_pinecone import PineconeVectorStore
+import io
+import hashlib
+import asyncio
+import time
+from itertools import islice
+from dataclasses import dataclass
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain.tools import tool
+from langchain.tools import ToolRuntime
+from langchain_core.tools import StructuredTool
+from langchain_core.documents import Document
+
+import docx2txt
+from pypdf import PdfReader
+
+from AI.rerank import rerank, arerank
+from AI.embeddings import embeddings
+from AI.vectorstore import get_vector_backend
+
+from utils.metrics import timed, VECTOR_SEARCH_SECONDS, INGESTED_CHUNKS
+from utils.tracing import span
+from utils.config import CHUNK_SIZE, CHUNK_OVERLAP, SEPARATORS, BASE_K, USE_RERANKING, INGEST_BATCH_SIZE, INGEST_CONCURRENCY, INGEST_MAX_RETRIES, INGEST_RETRY_BASE_DELAY, VECTOR_BACKEND
+
+def _iter_pages(file_bytes: bytes, filename: str):
+    """Parse straight from the upload buffer, yielding one page at a time."""
+    filename_lower = filename.lower()
+
+    if filename_lower.endswith('.pdf'):
+        reader = PdfReader(io.BytesIO(file_bytes))
+        for page_number, page in enumerate(reader.pages):
+            yield Document(page_content=page.extract_text() or "", metadata={'page': page_number})
+    elif filename_lower.endswith('.docx'):
+        yield Document(page_content=docx2txt.process(io.BytesIO(file_bytes)))
+    elif filename_lower.endswith('.txt'):
+        yield Document(page_content=file_bytes.decode('utf-8', errors='replace'))
+    else:
+        raise ValueError(f"Unsupported file type: {filename}")
+
+def _iter_chunks(conversation_id: str, file_bytes: bytes, filename: str):
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=SEPARATORS
+    )
 
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
+    for page in _iter_pages(file_bytes, filename):
+        for doc in splitter.split_documents([page]):
+            doc.metadata['source'] = filename
+            doc.metadata['conversation_id'] = str(conversation_id)
+            yield doc
+
+def document_hash(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def _document_key(conversation_id: str, filename: str) -> str:
+    # Stable across re-uploads of the same file, so unchanged chunks keep their ids
+    return hashlib.sha256(f"{conversation_id}:{filename}".encode("utf-8")).hexdigest()[:32]
+
+def _chunk_id(document_key: str, doc: Document) -> str:
+    return f"{document_key}#{hashlib.sha256(doc.page_content.encode('utf-8')).hexdigest()}"
+
+def _next_batch(chunks) -> list[Document]:
+    return list(islice(chunks, INGEST_BATCH_SIZE))
+
+async def _with_retries(step, *args):
+    """Retry a single pipeline step with exponential backoff; other batches keep their progress."""
+    for attempt in range(INGEST_MAX_RETRIES + 1):
+        try:
+            return await step(*args)
+        except Exception as e:
+            if attempt == INGEST_MAX_RETRIES:
+                raise
+            delay = INGEST_RETRY_BASE_DELAY * (2 ** attempt)
+            print(f"Ingestion step {step.__name__} failed ({e!r}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+async def add_to_rag(conversation_id: str, file_bytes: bytes, filename: str, on_progress=None) -> str:
+    """Insert file into vector database for a specific conversation."""
+    namespace = str(conversation_id)
+    started = time.perf_counter()
+
+    document_key = _document_key(conversation_id, filename)
+    content_hash = document_hash(file_bytes)
+    existing_ids = await get_vector_backend().alist_ids(namespace, f"{document_key}#")
+    seen_ids = set()
+    skipped = 0
+
+    chunks = _iter_chunks(conversation_id, file_bytes, filename)
+    embed_slots = asyncio.Semaphore(INGEST_CONCURRENCY)
+    # Backpressure: parsing stops once this many batches are waiting to be embedded or upserted
+    in_flight = asyncio.Semaphore(INGEST_CONCURRENCY * 2)
+    tasks = []
+    total = 0
+    done = 0
+
+    async def process(batch: list[Document], ids: list[str]):
+        nonlocal done
+        try:
+            # While this batch upserts, the freed slot lets the next batch start embedding
+            async with embed_slots:
+                vectors = await _with_retries(embeddings.aembed_documents, [doc.page_content for doc in batch])
+            await _with_retries(get_vector_backend().aupsert, namespace, ids, vectors, batch)
+        finally:
+            in_flight.release()
+        done += len(batch)
+        INGESTED_CHUNKS.labels("upserted").inc(len(batch))
+        if on_progress is not None:
+            await on_progress(done, None)
 
-from langchain_community.document_compressors import FlashrankRerank
-from langchain_classic.retrievers.contextual_compression import ContextualCompressionRetriever
+    try:
+        while True:
+            await in_flight.acquire()
+            batch = await asyncio.to_thread(_next_batch, chunks)
+            if not batch:
+                in_flight.release()
+                break
+
+            new_docs, ids = [], []
+            for doc in batch:
+                chunk_id = _chunk_id(document_key, doc)
+                if chunk_id in seen_ids:
+                    continue
+                seen_ids.add(chunk_id)
+                total += 1
+                # Chunks already stored from a previous version of this file are left alone
+                if chunk_id in existing_ids:
+                    skipped += 1
+                    INGESTED_CHUNKS.labels("unchanged").inc()
+                    continue
+                doc.metadata['doc_hash'] = content_hash
+                new_docs.append(doc)
+                ids.append(chunk_id)
+
+            if not new_docs:
+                in_flight.release()
+                continue
+            tasks.append(asyncio.create_task(process(new_docs, ids)))
+        await asyncio.gather(*tasks)
+
+        # Chunks that disappeared in the new version of the file
+        stale_ids = list(existing_ids - seen_ids)
+        if stale_ids:
+            await _with_retries(get_vector_backend().adelete, namespace, stale_ids)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if on_progress is not None:
+        await on_progress(done, total)
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed > 0 else 0.0
+    return (
+        f"Insertion Successful: {total} chunks from {filename}, {total - skipped} upserted, "
+        f"{skipped} unchanged ({rate:.1f} chunks/sec)"
+    )
 
-from utils.config import INDEX_NAME, EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, SEPARATORS, BASE_K, TOP_N, USE_RERANKING, RERANK_MODEL, DIMENSIONS
+@dataclass
+class ConversationContext:
+    """Per-run agent context; carries the conversation whose namespace the RAG tool searches."""
+    conversation_id: str
+    user_id: str | None = None
+
+def _format_docs(doc_results: list[Document]) -> str:
+    formatted_docs = []
+    for i, doc in enumerate(doc_results, 1):
+        formatted_docs.append(
+            f"---DOCUMENT {i}---\n{doc.page_content}\n---END OF DOCUMENT {i}---"
+        )
 
-pc = Pinecone()
+    return "\n\n".join(formatted_docs) or "No relevant information found."
 
-if not pc.has_index(INDEX_NAME):
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=DIMENSIONS,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1"),
-    )
-index = pc.Index(INDEX_NAME)
+def _rag_runtime(conversation_id: str, query: str) -> str:
+    """Blocking RAG lookup, kept for scripts and sync callers."""
 
-def add_to_rag(conversation_id: str, file_bytes: bytes, filename: str) -> str:
-    """Insert file into vector database for a specific conversation."""
     namespace = str(conversation_id)
-    
-    vector_store = PineconeVectorStore(
-        index=index,
-        embedding=EMBEDDING_MODEL,
-        namespace=namespace
-    )
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as tmp_file:
-        tmp_file.write(file_bytes)
-        tmp_path = tmp_file.name
-    
-    try:
-        filename_lower = filename.lower()
-        
-        if filename_lower.endswith('.pdf'):
-            loader = PyPDFLoader(tmp_path)
-        elif filename_lower.endswith('.docx'):
-            loader = Docx2txtLoader(tmp_path)
-        elif filename_lower.endswith('.txt'):
-            loader = TextLoader(tmp_path)
-        else:
-            raise ValueError(f"Unsupported file type: {filename}")
-        
-        documents = loader.load()
-        
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            separators=SEPARATORS
-        )
-        
-        split_docs = splitter.split_documents(documents)
-        
-        for doc in split_docs:
-            doc.metadata['source'] = filename
-            doc.metadata['conversation_id'] = str(conversation_id)
-        
-        uuids = [str(uuid4()) for _ in range(len(split_docs))]
-        vector_store.add_documents(documents=split_docs, ids=uuids)
-        
-        return f"Insertion Successful: {len(split_docs)} chunks created from {filename}"
-    
-    finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
-
-def make_query_rag_tool(conversation_id: str):
-
-    def _rag_runtime(query: str) -> str:
-        """Actual RAG logic. Pydantic never inspects this."""
-
-        namespace = str(conversation_id)
-
-        vector_store = PineconeVectorStore(
-            index=index,
-            embedding=EMBEDDING_MODEL,
-            namespace=namespace
-        )
 
-        base_retriever = vector_store.as_retriever(
-            search_kwargs={"k": BASE_K}
-        )
+    query_vector = embeddings.embed_query(query)
+    with span("vector_search", backend=VECTOR_BACKEND, top_k=BASE_K), timed(VECTOR_SEARCH_SECONDS, backend=VECTOR_BACKEND):
+        doc_results = get_vector_backend().query(namespace, query_vector, BASE_K)
+    if USE_RERANKING:
+        with span("rerank", documents=len(doc_results)):
+            doc_results = rerank(query, doc_results)
+
+    return _format_docs(doc_results)
+
+async def _arag_runtime(conversation_id: str, query: str) -> str:
+    """Async RAG lookup: async embedding and async vector search, no worker thread held."""
+
+    namespace = str(conversation_id)
 
-        if USE_RERANKING:
-            retriever = ContextualCompressionRetriever(
-                base_retriever=base_retriever,
-                base_compressor=FlashrankRerank(
-                    model=RERANK_MODEL,
-                    top_n=TOP_N
-                )
-            )
-        else:
-            retriever = base_retriever
+    query_vector = await embeddings.aembed_query(query)
+    with span("vector_search", backend=VECTOR_BACKEND, top_k=BASE_K), timed(VECTOR_SEARCH_SECONDS, backend=VECTOR_BACKEND):
+        doc_results = await get_vector_backend().aquery(namespace, query_vector, BASE_K)
 
-        doc_results = retriever.invoke(query)
+    if USE_RERANKING:
+        with span("rerank", documents=len(doc_results)):
+            doc_results = await arerank(query, doc_results)
 
-        formatted_docs = []
-        for i, doc in enumerate(doc_results, 1):
-            formatted_docs.append(
-                f"---DOCUMENT {i}---\n{doc.page_content}\n---END OF DOCUMENT {i}---"
-            )
+    return _format_docs(doc_results)
 
-        return "\n\n".join(formatted_docs) or "No relevant information found."
+def _query_rag(query: str, runtime: ToolRuntime[ConversationContext]) -> str:
+    """Retrieve relevant documents for a query from the current conversation."""
+    return _rag_runtime(runtime.context.conversation_id, query)
 
-    @tool
-    def query_rag(query: str) -> str:
-        """Retrieve relevant documents for a query from a specific conversation."""
-        return _rag_runtime(query)
+async def _aquery_rag(query: str, runtime: ToolRuntime[ConversationContext]) -> str:
+    """Retrieve relevant documents for a query from the current conversation."""
+    return await _arag_runtime(runtime.context.conversation_id, query)
 
-    return query_rag
+query_rag = StructuredTool.from_function(
+    func=_query_rag,
+    coroutine=_aquery_rag,
+    name="query_rag",
+)
 
 
 def clear_rag(conversation_id: int) -> str:
     """Delete all documents for a specific conversation."""
     namespace = str(conversation_id)
-    index.delete(namespace=namespace, delete_all=True)
+    get_vector_backend().clear(namespace)
     return f"RAG memory of conversation {conversation_id} was successfully wiped out"
\ No newline at end of file
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from langchain_core.documents import Document
+from langchain_community.document_compressors import FlashrankRerank
+
+from utils.config import RERANK_MODEL, TOP_N, RERANK_WORKERS, RERANK_BATCH_WINDOW_MS, RERANK_MAX_BATCH_PAIRS
+
+# One cross-encoder per process; loading the ONNX model is the expensive part
+_reranker = None
+_reranker_lock = threading.Lock()
+
+# Bounded pool so scoring never competes with the default threadpool used by FastAPI
+_executor = ThreadPoolExecutor(max_workers=RERANK_WORKERS, thread_name_prefix="rerank")
+
+_queue = None
+_batcher_task = None
+
+def get_reranker() -> FlashrankRerank:
+    """Return the process-wide reranker, loading the model on first use."""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = FlashrankRerank(model=RERANK_MODEL, top_n=TOP_N)
+    return _reranker
+
+def warm_reranker() -> None:
+    """Load the model and run one scoring pass so the first real query pays no setup cost."""
+    _score_pairs([("warmup", "warmup passage")])
+
+def _score_pairs(pairs: list[tuple[str, str]]) -> list[float]:
+    """Score (query, passage) pairs in a single ONNX call."""
+    # Ranker.rerank takes one query per call, so pairs from several queries are scored through its
+    # tokenizer and session directly; those are not public API, hence flashrank is pinned in requirements.txt
+    ranker = get_reranker().client
+    encoded = ranker.tokenizer.encode_batch([list(pair) for pair in pairs])
+    input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+    token_type_ids = np.array([e.type_ids for e in encoded], dtype=np.int64)
+    attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+
+    onnx_input = {"input_ids": input_ids, "attention_mask": attention_mask}
+    if not np.all(token_type_ids == 0):
+        onnx_input["token_type_ids"] = token_type_ids
+
+    logits = ranker.session.run(None, onnx_input)[0]
+    if logits.shape[1] == 1:
+        scores = 1 / (1 + np.exp(-logits.flatten()))
+    else:
+        exp_logits = np.exp(logits)
+        scores = exp_logits[:, 1] / np.sum(exp_logits, axis=1)
+    return scores.tolist()
+
+def _top_documents(documents: list[Document], scores: list[float], top_n: int) -> list[Document]:
+    ranked = sorted(zip(documents, scores), key=lambda pair: pair[1], reverse=True)[:top_n]
+    return [
+        Document(
+            id=doc.id,
+            page_content=doc.page_content,
+            metadata={**doc.metadata, "relevance_score": score}
+        )
+        for doc, score in ranked
+    ]
+
+def rerank(query: str, documents: list[Document], top_n: int = TOP_N) -> list[Document]:
+    """Blocking rerank for sync callers."""
+    if not documents:
+        return []
+    scores = _score_pairs([(query, doc.page_content) for doc in documents])
+    return _top_documents(documents, scores, top_n)
+
+async def _run_batcher():
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _queue.get()]
+        pair_count = len(batch[0][1])
+        deadline = loop.time() + RERANK_BATCH_WINDOW_MS / 1000
+
+        # Collect whatever else arrives within the window into the same model call
+        while pair_count < RERANK_MAX_BATCH_PAIRS:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            pair_count += len(item[1])
+
+        # Any failure fails this batch's callers; the loop must survive it or every later rerank hangs
+        try:
+            pairs = [(query, doc.page_content) for query, documents, _, _ in batch for doc in documents]
+            scores = await loop.run_in_executor(_executor, _score_pairs, pairs)
+            offset = 0
+            for _, documents, top_n, future in batch:
+                doc_scores = scores[offset:offset + len(documents)]
+                offset += len(documents)
+                if not future.done():
+                    future.set_result(_top_documents(documents, doc_scores, top_n))
+        except Exception as e:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+async def arerank(query: str, documents: list[Document], top_n: int = TOP_N) -> list[Document]:
+    """Rerank without blocking the event loop; concurrent calls are micro-batched."""
+    global _queue, _batcher_task
+    if not documents:
+        return []
+    if _batcher_task is None or _batcher_task.done():
+        _queue = asyncio.Queue()
+        _batcher_task = asyncio.create_task(_run_batcher())
+
+    future = asyncio.get_running_loop().create_future()
+    await _queue.put((query, documents, top_n, future))
+    return await future
@@ -0,0 +1,138 @@
+
+import time
+import asyncio
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import ToolMessage
+from langgraph.errors import GraphBubbleUp
+
+from utils.metrics import TOOL_CALL_SECONDS
+from utils.tracing import span
+from utils.config import TOOL_TIMEOUT_SECONDS, DEFAULT_TOOL_TIMEOUT_SECONDS, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after reset_seconds lets a single trial call through"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.times_opened = 0
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self.opened_at >= self.reset_seconds
+
+    def available(self) -> bool:
+        """Whether a call would be let through right now"""
+        return self.opened_at is None or (self._cooled_down() and not self.probing)
+
+    def acquire(self) -> bool:
+        """Let a call through; while half-open only one trial runs, everyone else is turned away until it succeeds"""
+        if self.opened_at is None:
+            return True
+        if self.probing or not self._cooled_down():
+            return False
+        self.probing = True
+        return True
+
+    def release(self):
+        # A trial that ended without a verdict (cancelled, interrupted) frees the slot for the next one
+        self.probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        # A failed trial call re-opens straight away
+        if self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.times_opened += 1
+                print(f"Circuit opened for {self.name} after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": "closed" if self.opened_at is None else ("half-open" if self._cooled_down() else "open"),
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened
+        }
+
+breakers = {}
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Only called with registered tool names, so the dict stays as small as the tool list"""
+    if name not in breakers:
+        breakers[name] = CircuitBreaker(name, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+    return breakers[name]
+
+def breaker_stats() -> dict:
+    return {name: breaker.stats() for name, breaker in breakers.items()}
+
+def _tool_error(request, content: str) -> ToolMessage:
+    return ToolMessage(
+        content=content,
+        tool_call_id=request.tool_call["id"],
+        name=request.tool_call["name"],
+        status="error"
+    )
+
+class ToolGuardMiddleware(AgentMiddleware):
+    """Per-tool deadlines and circuit breakers; tools with an open circuit are hidden from the model"""
+
+    async def awrap_model_call(self, request, handler):
+        tools = [t for t in request.tools if isinstance(t, dict) or get_breaker(t.name).available()]
+        if len(tools) != len(request.tools):
+            request = request.override(tools=tools)
+        return await handler(request)
+
+    async def awrap_tool_call(self, request, handler):
+        name = request.tool_call["name"]
+        with span("tool.call", tool=name) as trace_span:
+            result, outcome, elapsed = await self._guarded_call(request, handler, name)
+            # A hallucinated tool name must not become a new label value
+            TOOL_CALL_SECONDS.labels(name if request.tool is not None else "unknown", outcome).observe(elapsed)
+            if trace_span is not None:
+                trace_span.set(outcome=outcome)
+                if outcome != "ok":
+                    trace_span.status = "error"
+            return result
+
+    async def _guarded_call(self, request, handler, name: str):
+        started = time.perf_counter()
+        if request.tool is None:
+            # A hallucinated name gets the agent's usual tool-not-found error, and no breaker
+            return await handler(request), "error", time.perf_counter() - started
+
+        breaker = get_breaker(name)
+        if not breaker.acquire():
+            return _tool_error(request, f"{name} is temporarily unavailable. Answer without it."), "rejected", 0.0
+
+        timeout = TOOL_TIMEOUT_SECONDS.get(name, DEFAULT_TOOL_TIMEOUT_SECONDS)
+        try:
+            result = await asyncio.wait_for(handler(request), timeout)
+        except GraphBubbleUp:
+            # Interrupts and commands are control flow, not failures
+            breaker.release()
+            raise
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            error = _tool_error(request, f"{name} timed out after {timeout:g}s. Answer without it.")
+            return error, "timeout", time.perf_counter() - started
+        except Exception as e:
+            breaker.record_failure()
+            error = _tool_error(request, f"{name} failed ({type(e).__name__}). Answer without it.")
+            return error, "error", time.perf_counter() - started
+
+        # Handled ToolExceptions (bad arguments, no results) still mean the service answered
+        breaker.record_success()
+        return result, "ok", time.perf_counter() - started
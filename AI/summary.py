@@ -0,0 +1,72 @@
+
+import asyncio
+from uuid import UUID
+
+from AI.bot import summarize_messages
+from AI.context import fit_history, message_tokens, split_recent
+from database.initializations import AsyncSessionLocal, ConvoModel
+from database.conversations import save_conversation_summary
+from database.messages import get_recent_messages
+from utils.config import CONTEXT_MAX_MESSAGES, SUMMARY_CHUNK_TOKENS, SUMMARY_REFRESH_MAX_TOKENS, SUMMARY_MESSAGE_MAX_TOKENS
+from utils.tracing import trace
+
+_running = set()
+_tasks = set()
+
+def _summary_tokens(message) -> int:
+    # summarize_messages cuts long messages to SUMMARY_MESSAGE_MAX_TOKENS
+    return min(message_tokens(message), SUMMARY_MESSAGE_MAX_TOKENS)
+
+def _chunks(messages: list):
+    """Group messages into summarization calls of bounded size, keeping same-timestamp pairs together"""
+    chunk, tokens = [], 0
+    for message in messages:
+        cost = _summary_tokens(message)
+        if chunk and tokens + cost > SUMMARY_CHUNK_TOKENS and message.created_at != chunk[-1].created_at:
+            yield chunk
+            chunk, tokens = [], 0
+        chunk.append(message)
+        tokens += cost
+    if chunk:
+        yield chunk
+
+async def refresh_summary(conversation_id: UUID):
+    """Fold the messages that no longer fit the context budget into the conversation summary.
+    Bounded per refresh: at most the history a turn ever loads, and only its newest overflow."""
+    async with AsyncSessionLocal() as db:
+        convo = await db.get(ConvoModel, conversation_id)
+        if convo is None:
+            return
+        summary = convo.summary
+        messages = await get_recent_messages(db, conversation_id, limit=CONTEXT_MAX_MESSAGES, since=convo.summary_until)
+
+    overflow, _ = fit_history(messages, summary)
+    skipped, overflow = split_recent(overflow, SUMMARY_REFRESH_MAX_TOKENS, _summary_tokens)
+    if skipped and not overflow:
+        # Too big to summarize at all; mark it covered so it stops holding back the window
+        async with AsyncSessionLocal() as db:
+            await save_conversation_summary(db, conversation_id, summary, skipped[-1].created_at)
+        return
+    for chunk in _chunks(overflow):
+        summary = await summarize_messages(summary, chunk, user=str(conversation_id))
+        # Saved per chunk so a long backlog keeps its progress if a later call fails
+        async with AsyncSessionLocal() as db:
+            await save_conversation_summary(db, conversation_id, summary, chunk[-1].created_at)
+
+async def _run_refresh(conversation_id: UUID):
+    try:
+        with trace("summary.refresh", conversation_id=str(conversation_id)):
+            await refresh_summary(conversation_id)
+    except Exception as e:
+        print(f"Summary refresh failed for {conversation_id}: {e!r}")
+    finally:
+        _running.discard(conversation_id)
+
+def schedule_summary_refresh(conversation_id: UUID):
+    """Refresh the summary in the background; at most one refresh per conversation at a time"""
+    if conversation_id in _running:
+        return
+    _running.add(conversation_id)
+    task = asyncio.create_task(_run_refresh(conversation_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
@@ -0,0 +1,137 @@
+
+import json
+import time
+import asyncio
+from urllib.parse import urlsplit, urlunsplit
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from utils.cache import TTLCache
+
+tool_caches = {}
+
+class ToolUnavailable(Exception):
+    """The upstream service failed; unlike ToolException this counts against the tool's circuit breaker"""
+
+# Free text whose case and spacing never change the answer; paths, regexes and instructions keep theirs
+CASE_INSENSITIVE_ARGUMENTS = {"query"}
+
+def _normalize(value, name: str | None = None):
+    """Canonical form of tool arguments, so trivially different calls share a cache entry"""
+    if isinstance(value, str):
+        if name in CASE_INSENSITIVE_ARGUMENTS:
+            return " ".join(value.split()).lower()
+        stripped = value.strip()
+        if stripped.lower().startswith(("http://", "https://")):
+            # Only scheme and host are case-insensitive in a URL
+            parts = urlsplit(stripped)
+            return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/") or "/", parts.query, ""))
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item, name) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize(item, key) for key, item in sorted(value.items()) if item is not None}
+    return value
+
+def cache_key(arguments: dict) -> str:
+    return json.dumps(_normalize(arguments), sort_keys=True, default=str)
+
+class ToolCache:
+    """TTL + LRU cache for one tool's results; identical concurrent calls share one request"""
+
+    def __init__(self, name: str, ttl: float, max_size: int, estimated_credits: float):
+        self.name = name
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.estimated_credits = estimated_credits
+        self.in_flight = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.spent_credits = 0.0
+        self.saved_credits = 0.0
+        self.saved_seconds = 0.0
+
+    def _credits(self, result) -> float:
+        # Tavily reports real usage when include_usage is set
+        if isinstance(result, dict):
+            credits = (result.get("usage") or {}).get("credits")
+            if credits is not None:
+                return float(credits)
+        return self.estimated_credits
+
+    async def _fetch(self, key: str, fetch):
+        started = time.perf_counter()
+        result = await fetch()
+        entry = (result, time.perf_counter() - started, self._credits(result))
+        self.spent_credits += entry[2]
+        # Tavily tools return {"error": ...} instead of raising; never cache those
+        if isinstance(result, dict) and "error" in result:
+            self.errors += 1
+        else:
+            self.cache.set(key, entry)
+        return entry
+
+    async def get(self, key: str, fetch):
+        entry = self.cache.get(key)
+        if entry is not None:
+            result, seconds, credits = entry
+            self.saved_seconds += seconds
+            self.saved_credits += credits
+            return result
+
+        flight = self.in_flight.get(key)
+        joined = flight is not None
+        if joined:
+            task, started = flight
+            self.coalesced += 1
+            self.saved_seconds += time.perf_counter() - started
+        else:
+            self.calls += 1
+            # Its own task, so a cancelled caller does not cancel the request for everyone else
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            task.add_done_callback(lambda done: self._landed(key, done))
+            self.in_flight[key] = (task, time.perf_counter())
+
+        result, seconds, credits = await asyncio.shield(task)
+        if joined:
+            self.saved_credits += credits
+        return result
+
+    def _landed(self, key: str, task: asyncio.Task):
+        self.in_flight.pop(key, None)
+        if not task.cancelled():
+            # Mark a failure as retrieved even if every caller has gone away
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "spent_credits": round(self.spent_credits, 2),
+            "saved_credits": round(self.saved_credits, 2),
+            "saved_seconds": round(self.saved_seconds, 3)
+        }
+
+def cached_tool(tool: BaseTool, ttl: float, max_size: int, estimated_credits: float) -> StructuredTool:
+    """Same name, description and arguments as tool, answered from a ToolCache"""
+    cache = ToolCache(tool.name, ttl, max_size, estimated_credits)
+    tool_caches[tool.name] = cache
+
+    async def run(**kwargs):
+        result = await cache.get(cache_key(kwargs), lambda: tool._arun(**kwargs))
+        if isinstance(result, dict) and "error" in result:
+            raise ToolUnavailable(f"{tool.name} failed: {result['error']!r}")
+        return result
+
+    return StructuredTool.from_function(
+        coroutine=run,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        handle_tool_error=True
+    )
+
+def tool_cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in tool_caches.items()}
@@ -3,45 +3,59 @@ from langchain_tavily import TavilySearch, TavilyCrawl, TavilyExtract, TavilyMap
 from langchain.tools import tool
 
 from datetime import datetime
+from functools import lru_cache
 
-from utils.config import TAVILY_API_KEY
-
-search = TavilySearch(
-    max_results=3,                   
-    topic="general",
-    include_answer="basic",           
-    include_raw_content=False,        
-    include_images=True,             
-    include_image_descriptions=False, 
-    search_depth="advanced",          
-  )
-
-crawl = TavilyCrawl(
-    max_depth=3,                      
-    max_breadth=15,                   
-    limit=20,                         
-    extract_depth="basic",            
-    format="markdown",                
-    include_images=False,             
-    allow_external=False,             
-)
-
-extract = TavilyExtract(
-    extract_depth="advanced",         
-    format="markdown",        
-    include_images=False,             
-)
-
-mapsite = TavilyMap(
-    max_depth=3,
-    max_breadth=25,
-    limit=150,
-    allow_external=False,
-)
+from AI.tool_cache import cached_tool
+from utils.config import TAVILY_API_KEY, TOOL_CACHE_TTL_SECONDS, TOOL_CACHE_SIZE, TAVILY_ESTIMATED_CREDITS
 
 @tool
 def getDateAndTime():
     """Returns The Current Date & Time (Timezone IST)"""
     return datetime.now()
 
-universal_tools = [getDateAndTime, search, crawl, extract, mapsite]
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_universal_tools() -> list:
+    """Build the web tools on first use so importing this module needs no API key or network"""
+    search = TavilySearch(
+        max_results=3,                   
+        topic="general",
+        include_answer="basic",           
+        include_raw_content=False,        
+        include_images=True,             
+        include_image_descriptions=False, 
+        search_depth="advanced",          
+        include_usage=True,
+      )
+
+    crawl = TavilyCrawl(
+        max_depth=3,                      
+        max_breadth=15,                   
+        limit=20,                         
+        extract_depth="basic",            
+        format="markdown",                
+        include_images=False,             
+        allow_external=False,             
+        include_usage=True,
+    )
+
+    extract = TavilyExtract(
+        extract_depth="advanced",         
+        format="markdown",        
+        include_images=False,             
+        include_usage=True,
+    )
+
+    mapsite = TavilyMap(
+        max_depth=3,
+        max_breadth=25,
+        limit=150,
+        allow_external=False,
+        include_usage=True,
+    )
+
+    # Crawl and map are slow and costly, and popular questions repeat across users
+    web_tools = [
+        cached_tool(t, TOOL_CACHE_TTL_SECONDS[t.name], TOOL_CACHE_SIZE[t.name], TAVILY_ESTIMATED_CREDITS[t.name])
+        for t in (search, crawl, extract, mapsite)
+    ]
+    return [getDateAndTime] + web_tools
\ No newline at end of file
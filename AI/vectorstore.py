@@ -0,0 +1,336 @@
+import os
+import re
+import json
+import fcntl
+import shutil
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from contextlib import contextmanager
+
+import numpy as np
+
+from langchain_core.documents import Document
+
+from utils.config import VECTOR_BACKEND, LOCAL_VECTOR_DIR, INDEX_NAME, DIMENSIONS
+
+class VectorBackend(ABC):
+    """Namespaced vector storage; each conversation gets its own namespace."""
+
+    @abstractmethod
+    def query(self, namespace: str, vector: list[float], top_k: int) -> list[Document]:
+        ...
+
+    @abstractmethod
+    async def aquery(self, namespace: str, vector: list[float], top_k: int) -> list[Document]:
+        ...
+
+    @abstractmethod
+    async def aupsert(self, namespace: str, ids: list[str], vectors: list[list[float]], documents: list[Document]):
+        ...
+
+    @abstractmethod
+    async def alist_ids(self, namespace: str, prefix: str) -> set[str]:
+        ...
+
+    @abstractmethod
+    async def adelete(self, namespace: str, ids: list[str]):
+        ...
+
+    @abstractmethod
+    def clear(self, namespace: str):
+        ...
+
+def _match_to_document(match) -> Document | None:
+    metadata = dict(match["metadata"] or {})
+    text = metadata.pop("text", None)
+    if text is None:
+        return None
+    return Document(id=match["id"], page_content=text, metadata=metadata)
+
+class PineconeBackend(VectorBackend):
+    """Serverless Pinecone index, one Pinecone namespace per conversation."""
+
+    def __init__(self):
+        from pinecone import Pinecone, ServerlessSpec
+
+        self.pc = Pinecone()
+        if not self.pc.has_index(INDEX_NAME):
+            self.pc.create_index(
+                name=INDEX_NAME,
+                dimension=DIMENSIONS,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+            )
+        self.index = self.pc.Index(INDEX_NAME)
+
+        # Async index is bound to the running event loop, so it is opened lazily on first use
+        self.async_index = None
+        self._async_index_lock = asyncio.Lock()
+
+    async def get_async_index(self):
+        if self.async_index is None:
+            async with self._async_index_lock:
+                if self.async_index is None:
+                    description = await asyncio.to_thread(self.pc.describe_index, INDEX_NAME)
+                    self.async_index = self.pc.IndexAsyncio(host=description.host)
+        return self.async_index
+
+    def query(self, namespace, vector, top_k):
+        results = self.index.query(vector=vector, top_k=top_k, include_metadata=True, namespace=namespace)
+        return [doc for doc in map(_match_to_document, results["matches"]) if doc is not None]
+
+    async def aquery(self, namespace, vector, top_k):
+        idx = await self.get_async_index()
+        results = await idx.query(vector=vector, top_k=top_k, include_metadata=True, namespace=namespace)
+        return [doc for doc in map(_match_to_document, results["matches"]) if doc is not None]
+
+    async def aupsert(self, namespace, ids, vectors, documents):
+        idx = await self.get_async_index()
+        await idx.upsert(
+            vectors=[
+                {"id": chunk_id, "values": vector, "metadata": {**doc.metadata, "text": doc.page_content}}
+                for chunk_id, doc, vector in zip(ids, documents, vectors)
+            ],
+            namespace=namespace
+        )
+
+    async def alist_ids(self, namespace, prefix):
+        idx = await self.get_async_index()
+        found = set()
+        async for ids in idx.list(prefix=prefix, namespace=namespace):
+            found.update(ids)
+        return found
+
+    async def adelete(self, namespace, ids):
+        idx = await self.get_async_index()
+        # Pinecone accepts at most 1000 ids per delete
+        for i in range(0, len(ids), 1000):
+            await idx.delete(ids=ids[i:i + 1000], namespace=namespace)
+
+    def clear(self, namespace):
+        self.index.delete(namespace=namespace, delete_all=True)
+
+def _live_rows(segments: list, deleted: dict) -> dict:
+    """id -> (segment, row) of its newest copy; later segments shadow earlier ones, tombstones hide older copies"""
+    found = {}
+    for s in reversed(range(len(segments))):
+        entry, _, records = segments[s]
+        for row in reversed(range(len(records))):
+            chunk_id = records[row]["id"]
+            if chunk_id not in found and deleted.get(chunk_id, 0) <= entry["seq"]:
+                found[chunk_id] = (s, row)
+    return found
+
+class _LocalNamespace:
+    def __init__(self, version, manifest: dict, segments: list):
+        self.version = version
+        self.manifest = manifest
+        # (manifest entry, memory-mapped vectors, records) per segment, oldest first
+        self.segments = segments
+        self.rows = _live_rows(segments, manifest["deleted"])
+        by_segment = {}
+        for s, row in self.rows.values():
+            by_segment.setdefault(s, []).append(row)
+        self.live = {s: np.array(sorted(rows)) for s, rows in by_segment.items()}
+
+class LocalBackend(VectorBackend):
+    """Brute-force cosine search over memory-mapped, per-namespace files on local disk.
+    Each upsert appends an immutable segment and swaps in a new manifest, the single commit point.
+    Trailing segments are merged once they outgrow the one before them, so total rewriting stays O(N log N)."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.Lock()
+        self.loaded = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, namespace: str) -> str:
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", namespace):
+            raise ValueError(f"Invalid namespace: {namespace}")
+        return os.path.join(self.root, namespace)
+
+    def _version(self, path: str):
+        # os.replace gives the manifest a new inode, so this changes on every commit, from any process
+        for name in ("manifest.json", "records.json"):
+            try:
+                stat = os.stat(os.path.join(path, name))
+            except FileNotFoundError:
+                continue
+            return name, stat.st_ino, stat.st_mtime_ns
+        return None
+
+    def _read_manifest(self, path: str) -> dict:
+        try:
+            with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        if os.path.exists(os.path.join(path, "records.json")):
+            # A namespace written before segments existed is a single segment
+            return {"next_seq": 2, "segments": [{"seq": 1, "vectors": "vectors.npy", "records": "records.json"}], "deleted": {}}
+        return {"next_seq": 1, "segments": [], "deleted": {}}
+
+    def _load(self, namespace: str) -> _LocalNamespace:
+        path = self._path(namespace)
+        version = self._version(path)
+        cached = self.loaded.get(namespace)
+        if cached is not None and cached.version == version:
+            return cached
+        for attempt in range(3):
+            manifest = self._read_manifest(path)
+            try:
+                segments = []
+                for entry in manifest["segments"]:
+                    vectors = np.load(os.path.join(path, entry["vectors"]), mmap_mode="r")
+                    with open(os.path.join(path, entry["records"]), encoding="utf-8") as f:
+                        segments.append((entry, vectors, json.load(f)))
+                break
+            except FileNotFoundError:
+                # Another process merged those segments away after we read the manifest
+                if attempt == 2:
+                    raise
+        loaded = _LocalNamespace(version, manifest, segments)
+        self.loaded[namespace] = loaded
+        return loaded
+
+    @contextmanager
+    def _writing(self, namespace: str):
+        """Serializes writers to a namespace across threads and processes"""
+        path = self._path(namespace)
+        os.makedirs(path, exist_ok=True)
+        with self.lock, open(os.path.join(path, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield path
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_segment(self, path: str, manifest: dict, seq: int, vectors: np.ndarray, records: list[dict]):
+        name = f"{manifest['next_seq']:08d}"
+        manifest["next_seq"] += 1
+        # Unreferenced until the manifest is swapped in, so a crash here leaves only stray files
+        np.save(os.path.join(path, f"{name}.npy"), vectors)
+        with open(os.path.join(path, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        return {"seq": seq, "vectors": f"{name}.npy", "records": f"{name}.json"}, vectors, records
+
+    def _merge(self, path: str, manifest: dict, segments: list, start: int) -> list:
+        """Rewrite segments[start:] as one, dropping shadowed and deleted rows"""
+        live = sorted(_live_rows(segments[start:], manifest["deleted"]).values())
+        merged = []
+        if live:
+            vectors = np.concatenate([
+                np.asarray(segments[start + s][1][[row for seg, row in live if seg == s]])
+                for s in sorted({s for s, _ in live})
+            ])
+            records = [segments[start + s][2][row] for s, row in live]
+            merged = [self._write_segment(path, manifest, segments[-1][0]["seq"], vectors, records)]
+        if start == 0:
+            # Nothing is left for a tombstone to hide
+            manifest["deleted"] = {}
+        return segments[:start] + merged
+
+    def _commit(self, path: str, manifest: dict, segments: list, previous: list):
+        """Swap in the new manifest, then remove segment files it no longer references"""
+        manifest["segments"] = [entry for entry, _, _ in segments]
+        with open(os.path.join(path, "manifest.tmp.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(os.path.join(path, "manifest.tmp.json"), os.path.join(path, "manifest.json"))
+        kept = {name for entry in manifest["segments"] for name in (entry["vectors"], entry["records"])}
+        for entry in previous:
+            for name in (entry["vectors"], entry["records"]):
+                if name not in kept:
+                    try:
+                        os.remove(os.path.join(path, name))
+                    except FileNotFoundError:
+                        pass
+
+    def query(self, namespace, vector, top_k):
+        with self.lock:
+            loaded = self._load(namespace)
+        if not loaded.rows:
+            return []
+        query_vector = np.asarray(vector, dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+        scores, locations = [], []
+        for s, rows in loaded.live.items():
+            scores.append((loaded.segments[s][1] @ query_vector)[rows])
+            locations.extend((s, row) for row in rows)
+        scores = np.concatenate(scores)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        documents = []
+        for i in top:
+            s, row = locations[i]
+            record = loaded.segments[s][2][row]
+            documents.append(Document(id=record["id"], page_content=record["text"], metadata=record["metadata"]))
+        return documents
+
+    async def aquery(self, namespace, vector, top_k):
+        return await asyncio.to_thread(self.query, namespace, vector, top_k)
+
+    def _upsert(self, namespace, ids, vectors, documents):
+        new_vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(new_vectors, axis=1, keepdims=True)
+        new_vectors /= np.where(norms == 0, 1.0, norms)
+        records = [
+            {"id": chunk_id, "text": doc.page_content, "metadata": doc.metadata}
+            for chunk_id, doc in zip(ids, documents)
+        ]
+        with self._writing(namespace) as path:
+            loaded = self._load(namespace)
+            manifest = json.loads(json.dumps(loaded.manifest))
+            appended = self._write_segment(path, manifest, manifest["next_seq"], new_vectors, records)
+            segments = loaded.segments + [appended]
+            # Merge the tail while it is at least as big as the segment before it
+            start, size = len(segments) - 1, len(records)
+            while start > 0 and len(segments[start - 1][2]) <= size:
+                start -= 1
+                size += len(segments[start][2])
+            if start < len(segments) - 1:
+                segments = self._merge(path, manifest, segments, start)
+            self._commit(path, manifest, segments, loaded.manifest["segments"] + [appended[0]])
+
+    async def aupsert(self, namespace, ids, vectors, documents):
+        await asyncio.to_thread(self._upsert, namespace, ids, vectors, documents)
+
+    def _list_ids(self, namespace, prefix):
+        with self.lock:
+            loaded = self._load(namespace)
+        return {chunk_id for chunk_id in loaded.rows if chunk_id.startswith(prefix)}
+
+    async def alist_ids(self, namespace, prefix):
+        return await asyncio.to_thread(self._list_ids, namespace, prefix)
+
+    def _delete(self, namespace, ids):
+        with self._writing(namespace) as path:
+            loaded = self._load(namespace)
+            manifest = json.loads(json.dumps(loaded.manifest))
+            # Hides every copy written so far; a later upsert of the same id is live again
+            for chunk_id in ids:
+                manifest["deleted"][chunk_id] = manifest["next_seq"]
+            segments = loaded.segments
+            if len(manifest["deleted"]) > len(loaded.rows):
+                # Mostly tombstones: compact everything
+                segments = self._merge(path, manifest, segments, 0)
+            self._commit(path, manifest, segments, loaded.manifest["segments"])
+
+    async def adelete(self, namespace, ids):
+        await asyncio.to_thread(self._delete, namespace, ids)
+
+    def clear(self, namespace):
+        with self._writing(namespace) as path:
+            self.loaded.pop(namespace, None)
+            shutil.rmtree(path, ignore_errors=True)
+
+@lru_cache(maxsize=None)
+def get_vector_backend() -> VectorBackend:
+    """Create the configured backend on first use; Pinecone setup makes network calls"""
+    if VECTOR_BACKEND == "local":
+        return LocalBackend(LOCAL_VECTOR_DIR)
+    if VECTOR_BACKEND == "pinecone":
+        return PineconeBackend()
+    raise ValueError(f"Unknown VECTOR_BACKEND: {VECTOR_BACKEND}")
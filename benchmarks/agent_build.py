@@ -0,0 +1,58 @@
+
+# Per-request agent setup overhead: rebuilding the agent on every message vs. one compiled agent.
+# Runs offline with a fake chat model so only graph/tool construction is measured.
+# Usage: python -m benchmarks.agent_build
+
+import time
+from dataclasses import dataclass
+
+from langchain.agents import create_agent
+from langchain.tools import tool, ToolRuntime
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+ITERATIONS = 200
+
+class FakeToolModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+@dataclass
+class BenchContext:
+    conversation_id: str
+
+@tool
+def getDateAndTime():
+    """Returns The Current Date & Time"""
+    return "now"
+
+def make_closure_tool(conversation_id: str):
+    @tool
+    def query_rag(query: str) -> str:
+        """Retrieve relevant documents for a query from a specific conversation."""
+        return f"{conversation_id}:{query}"
+    return query_rag
+
+@tool
+def query_rag(query: str, runtime: ToolRuntime[BenchContext]) -> str:
+    """Retrieve relevant documents for a query from the current conversation."""
+    return f"{runtime.context.conversation_id}:{query}"
+
+def per_request(llm):
+    for i in range(ITERATIONS):
+        create_agent(model=llm, tools=[getDateAndTime, make_closure_tool(str(i))])
+
+def per_process(llm):
+    create_agent(model=llm, tools=[getDateAndTime, query_rag], context_schema=BenchContext)
+    for i in range(ITERATIONS):
+        BenchContext(conversation_id=str(i))
+
+def main():
+    llm = FakeToolModel(messages=iter([]))
+    for name, fn in (("per-request build (before)", per_request), ("per-process agent (after)", per_process)):
+        start = time.perf_counter()
+        fn(llm)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<28} {elapsed / ITERATIONS * 1000:8.3f} ms/request")
+
+if __name__ == "__main__":
+    main()
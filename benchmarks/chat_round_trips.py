@@ -0,0 +1,94 @@
+
+# Database round trips for one chat turn (the LLM call is left out), before and after combining the queries.
+# Counts statements, BEGIN/COMMIT and the pool pre-ping on checkout, then projects the cost at a given network RTT.
+# Seeds its own user and conversation and deletes them afterwards; needs a database at `alembic upgrade head`.
+# Usage: python -m benchmarks.chat_round_trips [turns] [rtt_ms]
+
+import asyncio
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import event, select, delete
+from sqlalchemy.sql import func
+
+from database.initializations import engine, AsyncSessionLocal, UserModel, ConvoModel, MessageModel
+from database.history_cache import get_history_cache
+from database.messages import get_chat_context, save_chat_messages
+
+round_trips = {"count": 0}
+
+def count(*args, **kwargs):
+    round_trips["count"] += 1
+
+async def old_turn(conversation_id, user_id, message: str):
+    """The chat turn as it was: access check, history read, ORM save and read-back"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(ConvoModel).where(ConvoModel.id == conversation_id, ConvoModel.user_id == user_id))
+        result.scalar_one_or_none()
+        result = await db.execute(
+            select(MessageModel).where(MessageModel.conversation_id == conversation_id)
+            .order_by(MessageModel.created_at.desc()).limit(20)
+        )
+        result.scalars().all()
+
+        user_msg = MessageModel(conversation_id=conversation_id, role="user", content=message)
+        ai_msg = MessageModel(conversation_id=conversation_id, role="assistant", content="reply")
+        db.add(user_msg)
+        db.add(ai_msg)
+        convo = await db.get(ConvoModel, conversation_id)
+        if convo:
+            convo.updated_at = func.now()
+        await db.commit()
+        await db.refresh(ai_msg)
+
+async def new_turn(conversation_id, user_id, message: str):
+    async with AsyncSessionLocal() as db:
+        await get_chat_context(db, conversation_id, user_id)
+        await save_chat_messages(db, conversation_id, message, "reply")
+
+async def measure(name: str, turn, conversation_id, user_id, turns: int, rtt_ms: float, cold_cache: bool = False):
+    round_trips["count"] = 0
+    started = time.perf_counter()
+    for i in range(turns):
+        if cold_cache:
+            await get_history_cache().invalidate(conversation_id)
+        await turn(conversation_id, user_id, f"message {i}")
+    elapsed = (time.perf_counter() - started) / turns
+    per_turn = round_trips["count"] / turns
+    print(f"{name:<28} {per_turn:5.1f} round trips/turn  {elapsed * 1000:6.2f} ms/turn locally  "
+          f"~{per_turn * rtt_ms:5.0f} ms of network wait at {rtt_ms:g} ms RTT")
+
+async def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rtt_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    async with AsyncSessionLocal() as db:
+        user = UserModel(email=f"bench-{datetime.now().timestamp()}@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        convo = ConvoModel(user_id=user.id, title="bench")
+        db.add(convo)
+        await db.commit()
+        user_id, conversation_id = user.id, convo.id
+
+    sync_engine = engine.sync_engine
+    listeners = [(sync_engine, "before_cursor_execute"), (sync_engine, "begin"), (sync_engine, "commit"), (sync_engine.pool, "checkout")]
+    for target, name in listeners:
+        event.listen(target, name, count)
+    try:
+        await measure("before", old_turn, conversation_id, user_id, turns, rtt_ms)
+        await measure("after, history cache miss", new_turn, conversation_id, user_id, turns, rtt_ms, cold_cache=True)
+        await measure("after, history cache hit", new_turn, conversation_id, user_id, turns, rtt_ms)
+    finally:
+        for target, name in listeners:
+            event.remove(target, name, count)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(MessageModel).where(MessageModel.conversation_id == conversation_id))
+            await db.execute(delete(ConvoModel).where(ConvoModel.id == conversation_id))
+            await db.execute(delete(UserModel).where(UserModel.id == user_id))
+            await db.commit()
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+
+# EXPLAIN every hot read query the app issues and fail if any of them still needs a sequential scan.
+# Seeds data inside one transaction and rolls it back, so it is safe against a dev database at `alembic upgrade head`.
+# Sequential scans are disabled for the session: a Seq Scan left in a plan means no usable index exists.
+# tests/test_query_plans.py runs the same EXPLAINs under pytest whenever DATABASE_URL is set.
+# Usage: python -m benchmarks.explain_hot_queries
+
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.initializations import (
+    engine, UserModel, ConvoModel, MessageModel, IngestionJobModel, RefreshTokenModel, OTPVerificationModel
+)
+from database.conversations import get_user_conversations
+from database.jobs import find_ingested_document, get_ingestion_job
+from database.history_cache import get_history_cache
+from database.messages import get_conversation_messages, get_recent_messages, get_chat_context, verify_conversation_access
+
+USERS = 20
+CONVOS_PER_USER = 25
+MESSAGES_PER_CONVO = 40
+
+async def seed(db: AsyncSession):
+    now = datetime.now(timezone.utc)
+    users = [UserModel(id=uuid4(), email=f"bench{i}@example.com", hashed_password="x") for i in range(USERS)]
+    db.add_all(users)
+    await db.flush()
+
+    convos = []
+    for user in users:
+        for c in range(CONVOS_PER_USER):
+            convos.append(ConvoModel(id=uuid4(), user_id=user.id, title=f"c{c}", created_at=now - timedelta(minutes=c)))
+    db.add_all(convos)
+    await db.flush()
+
+    db.add_all(
+        MessageModel(conversation_id=convo.id, role="user", content="hi", created_at=now - timedelta(seconds=m))
+        for convo in convos for m in range(MESSAGES_PER_CONVO)
+    )
+    db.add_all(
+        IngestionJobModel(conversation_id=convo.id, filename="a.pdf", content_hash=uuid4().hex, state="succeeded")
+        for convo in convos
+    )
+    db.add_all(
+        RefreshTokenModel(user_id=user.id, token_hash=uuid4().hex, expires_at=now + timedelta(days=7))
+        for user in users for _ in range(5)
+    )
+    db.add_all(
+        OTPVerificationModel(email=user.email, otp_code="123456", hashed_password="x", expires_at=now + timedelta(minutes=5))
+        for user in users for _ in range(5)
+    )
+    await db.flush()
+    return users[0], convos[0]
+
+async def run_hot_queries(db: AsyncSession, user, convo):
+    now = datetime.now(timezone.utc)
+    page = await get_conversation_messages(db, convo.id, user.id, limit=10)
+    await get_conversation_messages(db, convo.id, user.id, limit=10, before=page["before_cursor"])
+    await get_conversation_messages(db, convo.id, user.id, limit=10, after=page["before_cursor"])
+    convos = await get_user_conversations(db, user.id, limit=10)
+    await get_user_conversations(db, user.id, limit=10, before=convos["before_cursor"])
+    await get_recent_messages(db, convo.id)
+    await get_history_cache().invalidate(convo.id)
+    await get_chat_context(db, convo.id, user.id)
+    await verify_conversation_access(db, convo.id, user.id)
+    await find_ingested_document(db, convo.id, "a.pdf", "missing")
+    await get_ingestion_job(db, convo.id, uuid4(), user.id)
+    # Same statements the auth router builds inline
+    await db.execute(select(RefreshTokenModel).where(
+        RefreshTokenModel.token_hash == "missing",
+        RefreshTokenModel.is_revoked == False,
+        RefreshTokenModel.expires_at > now
+    ))
+    await db.execute(select(OTPVerificationModel).where(
+        OTPVerificationModel.email == user.email,
+        OTPVerificationModel.is_used == False,
+        OTPVerificationModel.expires_at > now
+    ))
+
+def scan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from scan_nodes(child)
+
+async def collect_plans() -> list[tuple[str, dict]]:
+    """(statement, plan) for every hot read query, planned with sequential scans disabled"""
+    captured = []
+    plans = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            db = AsyncSession(bind=conn, expire_on_commit=False)
+            user, convo = await seed(db)
+            await conn.exec_driver_sql("ANALYZE")
+
+            event.listen(engine.sync_engine, "before_cursor_execute", capture)
+            try:
+                await run_hot_queries(db, user, convo)
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+            await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for statement, parameters in captured:
+                result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                raw = result.scalar()
+                plans.append((statement, (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]))
+        finally:
+            await trans.rollback()
+    return plans
+
+def seq_scans(plan: dict) -> list[str]:
+    return [n["Relation Name"] for n in scan_nodes(plan) if n["Node Type"] == "Seq Scan"]
+
+def index_names(plan: dict) -> list[str]:
+    return sorted({n["Index Name"] for n in scan_nodes(plan) if "Index Name" in n})
+
+async def main() -> int:
+    try:
+        plans = await collect_plans()
+    finally:
+        await engine.dispose()
+
+    failures = 0
+    for statement, plan in plans:
+        scans = seq_scans(plan)
+        status = "SEQ SCAN on " + ", ".join(scans) if scans else "ok"
+        failures += bool(scans)
+        print(f"{status:<32} cost {plan['Total Cost']:>8.1f}  {', '.join(index_names(plan))}")
+        print("    " + " ".join(statement.split())[:140])
+
+    print(f"{len(plans)} queries, {failures} with sequential scans")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
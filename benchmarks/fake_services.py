@@ -0,0 +1,219 @@
+
+# Runs the real app with local stand-ins for Groq, Tavily, Ollama and Pinecone, for load tests that spend no credits.
+# Each stand-in sleeps for a lognormal latency and fails at a configurable rate; LOADTEST_PROFILE (JSON) overrides DEFAULT_PROFILE.
+# Everything else is real: routers, auth, Postgres, caches, scheduler, agent loop and ingestion.
+# Usage: python -m benchmarks.fake_services --port 8000   (normally started by benchmarks.load_test)
+
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from uuid import uuid4
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# median and p99 in milliseconds; error_rate is the share of calls that raise
+DEFAULT_PROFILE = {
+    "llm": {"median_ms": 450, "p99_ms": 2500, "error_rate": 0.005, "rate_limit_rate": 0.005},
+    "llm_token_ms": 8,  # between streamed tokens
+    "llm_answer_words": 120,
+    "llm_tool_rate": 0.35,  # share of first model calls in a turn that ask for a tool
+    "tavily": {"median_ms": 900, "p99_ms": 4000, "error_rate": 0.01},
+    "embedding": {"median_ms": 25, "p99_ms": 150, "error_rate": 0.0},
+    "vector": {"median_ms": 30, "p99_ms": 200, "error_rate": 0.0},
+    "embedding_dimensions": 768,
+}
+
+def load_profile() -> dict:
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    for key, value in json.loads(os.getenv("LOADTEST_PROFILE") or "{}").items():
+        if isinstance(value, dict):
+            profile.setdefault(key, {}).update(value)
+        else:
+            profile[key] = value
+    return profile
+
+PROFILE = load_profile()
+
+class FakeServiceError(Exception):
+    pass
+
+class FakeRateLimitError(Exception):
+    """Shaped like groq.RateLimitError as far as the scheduler looks"""
+    status_code = 429
+
+    def __init__(self):
+        super().__init__("rate limited")
+        self.response = type("Response", (), {"status_code": 429, "headers": {"retry-after": "1"}})()
+
+def _delay(service: str) -> float:
+    config = PROFILE[service]
+    median = config["median_ms"] / 1000
+    # Lognormal with the given median and p99 (z = 2.326 at the 99th percentile)
+    sigma = math.log(max(config["p99_ms"], config["median_ms"] + 1e-3) / config["median_ms"]) / 2.326
+    return random.lognormvariate(math.log(median), sigma)
+
+def _maybe_fail(service: str):
+    config = PROFILE[service]
+    if random.random() < config.get("rate_limit_rate", 0.0):
+        raise FakeRateLimitError()
+    if random.random() < config["error_rate"]:
+        raise FakeServiceError(f"{service} failed")
+
+async def call(service: str):
+    await asyncio.sleep(_delay(service))
+    _maybe_fail(service)
+
+def call_sync(service: str):
+    time.sleep(_delay(service))
+    _maybe_fail(service)
+
+WORDS = "the a report shows that latency budget queue index cache token search result answer model user data".split()
+
+class FakeGroq(BaseChatModel):
+    """Asks for a tool on a share of turns, otherwise answers; streams word by word"""
+
+    tool_names: list[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-groq"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"tool_names": [getattr(t, "name", None) or t["name"] for t in tools]})
+
+    def _reply(self, messages) -> AIMessage:
+        usage = {"input_tokens": 50 * len(messages), "output_tokens": PROFILE["llm_answer_words"]}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        tools = [name for name in self.tool_names if name in ("query_rag", "tavily_search")]
+        if tools and not isinstance(messages[-1], ToolMessage) and random.random() < PROFILE["llm_tool_rate"]:
+            name = random.choice(tools)
+            # A small query vocabulary, so repeated questions can hit the tool cache like real traffic
+            query = f"question {random.randint(1, 50)}"
+            return AIMessage(content="", tool_calls=[{"name": name, "args": {"query": query}, "id": f"call_{uuid4().hex[:12]}"}], usage_metadata=usage)
+        return AIMessage(content=" ".join(random.choices(WORDS, k=PROFILE["llm_answer_words"])), usage_metadata=usage)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        call_sync("llm")
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await call("llm")
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        # The latency draw is time to first token
+        await call("llm")
+        reply = self._reply(messages)
+        if reply.tool_calls:
+            tool_call = reply.tool_calls[0]
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[{"name": tool_call["name"], "args": json.dumps(tool_call["args"]), "id": tool_call["id"], "index": 0}],
+                usage_metadata=reply.usage_metadata
+            ))
+            return
+        words = reply.content.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(PROFILE["llm_token_ms"] / 1000)
+            last = i == len(words) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=word if i == 0 else " " + word,
+                usage_metadata=reply.usage_metadata if last else None
+            ))
+
+class FakeOllamaEmbeddings(Embeddings):
+    """Deterministic unit vectors from a hash of the text"""
+
+    def _vector(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(PROFILE["embedding_dimensions"]).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        call_sync("embedding")
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        await call("embedding")
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+async def fake_tavily(self, *args, **kwargs) -> dict:
+    await call("tavily")
+    query = kwargs.get("query") or kwargs.get("url") or (args[0] if args else "")
+    return {
+        "query": query,
+        "answer": f"Stand-in answer for {query}",
+        "results": [
+            {"title": f"Result {i}", "url": f"https://example.com/{i}", "content": " ".join(random.choices(WORDS, k=60)), "score": 0.9 - i / 10}
+            for i in range(3)
+        ],
+        "images": [],
+        "response_time": 0.0,
+        "usage": {"credits": 1},
+    }
+
+def install():
+    """Patch the app's service clients; must run before the agent, tools or vector backend are first built"""
+    import langchain_tavily._utilities as tavily
+    import AI.bot as bot
+    import AI.vectorstore as vectorstore
+    import routers.user as user_router
+    from AI.embeddings import embeddings
+
+    bot.get_llm = lambda: FakeGroq()
+    for wrapper in (tavily.TavilySearchAPIWrapper, tavily.TavilyExtractAPIWrapper, tavily.TavilyCrawlAPIWrapper, tavily.TavilyMapAPIWrapper):
+        wrapper.raw_results_async = fake_tavily
+    embeddings.underlying = FakeOllamaEmbeddings()
+
+    class FakePinecone(vectorstore.LocalBackend):
+        """The on-disk local backend behind Pinecone-like network latency"""
+
+        async def aquery(self, namespace, vector, top_k):
+            await call("vector")
+            return await super().aquery(namespace, vector, top_k)
+
+        async def aupsert(self, namespace, ids, vectors, documents):
+            await call("vector")
+            return await super().aupsert(namespace, ids, vectors, documents)
+
+        async def alist_ids(self, namespace, prefix):
+            await call("vector")
+            return await super().alist_ids(namespace, prefix)
+
+    vectorstore.LocalBackend = FakePinecone
+    vectorstore.VECTOR_BACKEND = "local"
+    # Every signup gets the same code, and no mail leaves the machine
+    user_router.send_otp = lambda bg, email: LOADTEST_OTP
+
+LOADTEST_OTP = "424242"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    import uvicorn
+    import main as app_module
+
+    install()
+    uvicorn.run(app_module.app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+
+# End-to-end load test: boots the app on benchmarks.fake_services against a local Postgres and drives a mix of
+# signup, login, chat (plain and streamed), uploads and listings from concurrent virtual users over real HTTP.
+# Reports throughput and p50/p95/p99 per endpoint; with --baseline it exits 1 when any p95 or error rate regressed.
+# DATABASE_URL must point at a disposable local Postgres (DB_SSL=disable over TCP); migrations run first.
+# Usage: python -m benchmarks.load_test --users 20 --duration 60 [--profile slow.json] [--save-baseline base.json | --baseline base.json]
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+import tempfile
+from collections import defaultdict
+from uuid import uuid4
+
+import httpx
+
+from benchmarks.fake_services import LOADTEST_OTP
+
+# Relative weight of each action a logged-in user picks between think times
+DEFAULT_MIX = {
+    "chat": 30,
+    "chat_stream": 15,
+    "list_messages": 20,
+    "list_conversations": 15,
+    "create_conversation": 8,
+    "upload_document": 4,
+    "login": 5,
+    "refresh": 3,
+}
+PASSWORD = "load-test-password"
+DOCUMENT_WORDS = "queue index cache budget token latency throughput percentile report".split()
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    async def timed(self, endpoint: str, request, ok_statuses=(200, 201, 202)):
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.record(endpoint, time.perf_counter() - started, False)
+            return None
+        self.record(endpoint, time.perf_counter() - started, response.status_code in ok_statuses)
+        return response
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        results = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            results[endpoint] = {
+                "count": len(values),
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / len(values),
+                "rps": len(values) / elapsed,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            }
+        return {"elapsed_seconds": elapsed, "endpoints": results}
+
+def percentile(values: list[float], pct: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, run_id: str, number: int):
+        self.client = client
+        self.recorder = recorder
+        self.email = f"load-{run_id}-{number}@example.com"
+        self.tokens = None
+        self.conversations = []
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.tokens['access_token']}"}
+
+    async def signup(self) -> bool:
+        sent = await self.recorder.timed("signup_send_otp", self.client.post(
+            "/auth/signup/send-otp", json={"email": self.email, "password": PASSWORD}
+        ))
+        if sent is None or sent.status_code != 200:
+            return False
+        verified = await self.recorder.timed("signup_verify_otp", self.client.post(
+            f"/auth/signup/verify-otp/{self.email}", json={"otp": LOADTEST_OTP}
+        ))
+        return verified is not None and verified.status_code == 201
+
+    async def login(self) -> bool:
+        response = await self.recorder.timed("login", self.client.post(
+            "/auth/login", json={"email": self.email, "password": PASSWORD}
+        ))
+        if response is None or response.status_code != 200:
+            return False
+        self.tokens = response.json()
+        return True
+
+    async def refresh(self):
+        response = await self.recorder.timed("refresh", self.client.post(
+            "/auth/refresh", json={"refresh_token": self.tokens["refresh_token"]}
+        ))
+        if response is not None and response.status_code == 200:
+            self.tokens = response.json()
+
+    async def create_conversation(self):
+        response = await self.recorder.timed("create_conversation", self.client.post(
+            "/conversations/", json={"title": "load test"}, headers=self.headers
+        ))
+        if response is not None and response.status_code in (200, 201):
+            self.conversations.append(response.json()["id"])
+
+    async def list_conversations(self):
+        await self.recorder.timed("list_conversations", self.client.get(
+            "/conversations/", params={"limit": 20}, headers=self.headers
+        ))
+
+    async def list_messages(self):
+        await self.recorder.timed("list_messages", self.client.get(
+            f"/conversations/{random.choice(self.conversations)}/messages/", params={"limit": 50}, headers=self.headers
+        ))
+
+    async def chat(self):
+        await self.recorder.timed("chat", self.client.post(
+            f"/conversations/{random.choice(self.conversations)}/messages/",
+            json={"message": f"Tell me about question {random.randint(1, 50)}"}, headers=self.headers
+        ))
+
+    async def chat_stream(self):
+        started = time.perf_counter()
+        first_token = None
+        ok = False
+        try:
+            async with self.client.stream(
+                "POST", f"/conversations/{random.choice(self.conversations)}/messages/stream",
+                json={"message": f"Explain question {random.randint(1, 50)}"}, headers=self.headers
+            ) as response:
+                async for line in response.aiter_lines():
+                    if line == "event: token" and first_token is None:
+                        first_token = time.perf_counter() - started
+                    elif line == "event: done":
+                        ok = True
+        except httpx.HTTPError:
+            pass
+        if first_token is not None:
+            self.recorder.record("chat_stream_first_token", first_token, True)
+        self.recorder.record("chat_stream", time.perf_counter() - started, ok)
+
+    async def upload_document(self):
+        conversation = random.choice(self.conversations)
+        text = "\n\n".join(" ".join(random.choices(DOCUMENT_WORDS, k=80)) for _ in range(random.randint(5, 40)))
+        response = await self.recorder.timed("upload_document", self.client.post(
+            f"/conversations/{conversation}/messages/document",
+            files={"file": (f"notes-{uuid4().hex[:8]}.txt", text.encode(), "text/plain")}, headers=self.headers
+        ))
+        if response is None or response.status_code != 202:
+            return
+        # Time until the job settles, as a user polling for it would see it
+        job = response.json()
+        started = time.perf_counter()
+        while job["state"] in ("queued", "running"):
+            await asyncio.sleep(0.25)
+            polled = await self.recorder.timed("poll_document_job", self.client.get(
+                f"/conversations/{conversation}/documents/jobs/{job['id']}", headers=self.headers
+            ))
+            if polled is None or polled.status_code != 200:
+                return
+            job = polled.json()
+        self.recorder.record("document_ingested", time.perf_counter() - started, job["state"] == "succeeded")
+
+    async def run(self, deadline: float, mix: dict, think_seconds: float):
+        if not await self.signup() or not await self.login():
+            return
+        await self.create_conversation()
+        if not self.conversations:
+            return
+        actions, weights = zip(*mix.items())
+        while time.perf_counter() < deadline:
+            await getattr(self, random.choices(actions, weights)[0])()
+            # Exponential think time, so arrivals are not in lockstep
+            await asyncio.sleep(random.expovariate(1 / think_seconds) if think_seconds > 0 else 0)
+
+async def drive(base_url: str, users: int, duration: float, ramp: float, mix: dict, think_seconds: float) -> dict:
+    recorder = Recorder()
+    run_id = uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def start(number: int):
+            # Users arrive spread over the ramp instead of all at once
+            await asyncio.sleep(ramp * number / max(users, 1))
+            await VirtualUser(client, recorder, run_id, number).run(deadline, mix, think_seconds)
+
+        await asyncio.gather(*(start(i) for i in range(users)))
+        recorder.finished = time.perf_counter()
+        stats = (await client.get("/stats")).json()
+    return {**recorder.summary(), "server_stats": stats}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def boot_server(port: int, profile: dict, workdir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "LOADTEST_PROFILE": json.dumps(profile),
+        "LOCAL_VECTOR_DIR": os.path.join(workdir, "vectors"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "TAVILY_API_KEY": os.environ.get("TAVILY_API_KEY", "fake"),
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "fake"),
+        "TRACE_EXPORTER": os.environ.get("TRACE_EXPORTER", "none"),
+    }
+    subprocess.run([sys.executable, "-m", "database.schemas"], env=env, check=True)
+    return subprocess.Popen([sys.executable, "-m", "benchmarks.fake_services", "--port", str(port)], env=env)
+
+async def wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 120):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            if server is not None and server.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                response = await client.get("/ready")
+                if response.status_code == 200:
+                    return
+                if response.json().get("error"):
+                    raise RuntimeError(f"Warmup failed: {response.json()['error']}")
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError("Server not ready in time")
+
+def print_report(results: dict):
+    print(f"\n{'endpoint':<26}{'count':>7}{'errors':>8}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, row in results["endpoints"].items():
+        print(f"{endpoint:<26}{row['count']:>7}{row['errors']:>8}{row['rps']:>8.2f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+    print(f"\n{results['elapsed_seconds']:.1f}s; LLM scheduler: {json.dumps(results['server_stats'].get('llm'))}")
+
+def regressions(results: dict, baseline: dict, tolerance: float, slack_ms: float, min_count: int) -> list[str]:
+    """p95s more than tolerance (plus slack_ms for noise) above the baseline, and error rates that rose"""
+    found = []
+    for endpoint, base in baseline["endpoints"].items():
+        row = results["endpoints"].get(endpoint)
+        if row is None or row["count"] < min_count or base["count"] < min_count:
+            continue
+        limit = base["p95_ms"] * (1 + tolerance) + slack_ms
+        if row["p95_ms"] > limit:
+            found.append(f"{endpoint}: p95 {row['p95_ms']:.1f} ms > {limit:.1f} ms (baseline {base['p95_ms']:.1f})")
+        if row["error_rate"] > base["error_rate"] + 0.01:
+            found.append(f"{endpoint}: error rate {row['error_rate']:.1%} (baseline {base['error_rate']:.1%})")
+    return found
+
+def parse_mix(value: str) -> dict:
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, value.split(",")):
+        name, weight = part.split("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown action {name}; known: {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60, help="seconds of load after the first user arrives")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which users arrive")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds between a user's actions")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX), help="overrides, e.g. chat=50,upload_document=0")
+    parser.add_argument("--profile", help="JSON file overriding the stand-ins' latency and error profile")
+    parser.add_argument("--url", help="drive an already running server instead of booting one")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--save-baseline", help="write the results as a baseline for later runs")
+    parser.add_argument("--baseline", help="fail when p95 latency or error rate regressed against this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth over the baseline")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="absolute p95 growth always allowed")
+    parser.add_argument("--min-count", type=int, default=20, help="endpoints with fewer samples are not gated")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    profile = {}
+    if args.profile:
+        with open(args.profile) as f:
+            profile = json.load(f)
+
+    server = None
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            base_url = args.url
+        else:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = boot_server(port, profile, workdir)
+        try:
+            asyncio.run(wait_ready(base_url, server))
+            results = asyncio.run(drive(base_url, args.users, args.duration, args.ramp, args.mix, args.think))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    results["config"] = {"users": args.users, "duration": args.duration, "mix": args.mix, "profile": profile}
+    print_report(results)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance, args.slack_ms, args.min_count)
+        for line in found:
+            print("REGRESSION", line)
+        print(f"{len(found)} regressions against {args.baseline}")
+        return 1 if found else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
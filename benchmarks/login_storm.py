@@ -0,0 +1,68 @@
+
+# Latency of an unrelated endpoint while a burst of logins hashes passwords.
+# Compares Argon2 run inline on the event loop (old behaviour) with the bounded hashing pool.
+# Usage: python -m benchmarks.login_storm
+
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from utils.passwords import hash_password_sync, verify_password_sync
+from utils.auth import verify_password
+
+LOGINS = 40
+PINGS = 200
+
+def build_app(inline: bool) -> FastAPI:
+    app = FastAPI()
+    stored = hash_password_sync("correct horse battery staple")
+
+    @app.post("/login")
+    async def login():
+        if inline:
+            return {"ok": verify_password_sync(stored, "correct horse battery staple")}
+        return {"ok": await verify_password(stored, "correct horse battery staple")}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+async def run(inline: bool) -> list[float]:
+    transport = httpx.ASGITransport(app=build_app(inline))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies = []
+
+        async def ping(delay: float):
+            # Measured from the scheduled send time, so time spent stuck behind a blocked loop counts
+            scheduled = time.perf_counter() + delay
+            await asyncio.sleep(delay)
+            await client.get("/ping")
+            latencies.append(time.perf_counter() - scheduled)
+
+        async def login(delay: float):
+            await asyncio.sleep(delay)
+            await client.post("/login")
+
+        # Logins arrive spread over the ping window so the pings overlap the storm
+        await asyncio.gather(
+            *(ping(i * 0.005) for i in range(PINGS)),
+            *(login(i * 0.01) for i in range(LOGINS))
+        )
+        return latencies
+
+def percentile(values: list[float], pct: float) -> float:
+    return statistics.quantiles(values, n=100)[int(pct) - 1]
+
+def main():
+    for name, inline in (("inline argon2 (before)", True), ("hashing pool (after)", False)):
+        latencies = asyncio.run(run(inline))
+        print(f"{name:<24} /ping p50 {percentile(latencies, 50) * 1000:7.1f} ms  "
+              f"p99 {percentile(latencies, 99) * 1000:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 # Database models
-from database.initializations import ConvoModel, MessageModel
+from database.initializations import ConvoModel, MessageModel, IngestionJobModel
+from database.pagination import encode_cursor, decode_cursor
+from database.history_cache import get_history_cache
 
 # SQLAlchemy
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, tuple_
 from uuid import UUID
+from datetime import datetime
 
 async def create_conversation(db: AsyncSession, user_id: UUID, title: str):
 
@@ -20,22 +23,54 @@ async def create_conversation(db: AsyncSession, user_id: UUID, title: str):
         "updated_at": str(new_convo.updated_at) if new_convo.updated_at else None
     }
 
-async def get_user_conversations(db: AsyncSession, user_id: UUID):
-    result = await db.execute(
-        select(ConvoModel)
-        .where(ConvoModel.user_id == user_id)
-        .order_by(ConvoModel.created_at.desc())
-    )
-    convos = result.scalars().all()
-    return [
+async def get_user_conversations(
+    db: AsyncSession,
+    user_id: UUID,
+    limit: int = 50,
+    before: str | None = None,
+    after: str | None = None
+):
+    """One page of conversations, newest first"""
+
+    key = tuple_(ConvoModel.created_at, ConvoModel.id)
+    query = select(ConvoModel.id, ConvoModel.title, ConvoModel.created_at, ConvoModel.updated_at).where(ConvoModel.user_id == user_id)
+    if after:
+        query = query.where(key > tuple_(*decode_cursor(after))).order_by(ConvoModel.created_at.asc(), ConvoModel.id.asc())
+    else:
+        if before:
+            query = query.where(key < tuple_(*decode_cursor(before)))
+        query = query.order_by(ConvoModel.created_at.desc(), ConvoModel.id.desc())
+
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after:
+        rows.reverse()
+
+    items = [
         {
             "id": c.id,
             "title": c.title,
             "created_at": str(c.created_at),
             "updated_at": str(c.updated_at) if c.updated_at else None
         }
-        for c in convos
+        for c in rows
     ]
+    return {
+        "items": items,
+        "before_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if rows and (has_more or after) else None,
+        "after_cursor": encode_cursor(rows[0].created_at, rows[0].id) if rows else after
+    }
+
+async def save_conversation_summary(db: AsyncSession, conversation_id: UUID, summary: str, summary_until: datetime):
+    """Store the rolling summary without touching updated_at"""
+    await db.execute(
+        update(ConvoModel)
+        .where(ConvoModel.id == conversation_id)
+        .values(summary=summary, summary_until=summary_until, updated_at=ConvoModel.updated_at)
+    )
+    await db.commit()
 
 async def delete_conversation_with_cleanup(db: AsyncSession, conversation_id: int, user_id: UUID):
 
@@ -51,6 +86,10 @@ async def delete_conversation_with_cleanup(db: AsyncSession, conversation_id: in
     await db.execute(
         delete(MessageModel).where(MessageModel.conversation_id == conversation_id)
     )
+    await db.execute(
+        delete(IngestionJobModel).where(IngestionJobModel.conversation_id == conversation_id)
+    )
     await db.delete(convo)
     await db.commit()
+    await get_history_cache().invalidate(conversation_id)
     return {"message": "Conversation deleted"}
\ No newline at end of file
@@ -0,0 +1,161 @@
+
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from uuid import UUID
+
+from utils.cache import TTLCache
+from utils.config import HISTORY_CACHE_BACKEND, HISTORY_CACHE_SIZE, HISTORY_CACHE_TTL_SECONDS, CONTEXT_MAX_MESSAGES, REDIS_URL, WEB_CONCURRENCY
+
+@dataclass(frozen=True)
+class CachedMessage:
+    """A stored chat message detached from any session; safe to share across requests"""
+    id: UUID
+    role: str
+    content: str
+    created_at: datetime
+
+    @classmethod
+    def from_model(cls, message) -> "CachedMessage":
+        return cls(message.id, message.role, message.content, message.created_at)
+
+class HistoryCache(ABC):
+    """Newest CONTEXT_MAX_MESSAGES messages per conversation, oldest first"""
+
+    @abstractmethod
+    async def get_or_load(self, conversation_id: UUID, loader) -> list[CachedMessage]:
+        ...
+
+    @abstractmethod
+    async def append(self, conversation_id: UUID, messages: list[CachedMessage]):
+        """Write-through after a commit; only extends windows that are already cached"""
+        ...
+
+    @abstractmethod
+    async def invalidate(self, conversation_id: UUID):
+        ...
+
+class MemoryHistoryCache(HistoryCache):
+    """Per-process LRU with a TTL"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.loading = {}
+
+    async def get_or_load(self, conversation_id: UUID, loader) -> list[CachedMessage]:
+        window = self.cache.get(conversation_id)
+        if window is not None:
+            return list(window)
+
+        token = object()
+        self.loading[conversation_id] = token
+        try:
+            window = await loader()
+        finally:
+            # A write during the load clears the token, so a stale read is never cached
+            fresh = self.loading.get(conversation_id) is token
+            if fresh:
+                del self.loading[conversation_id]
+        if fresh:
+            self.cache.set(conversation_id, tuple(window))
+        return window
+
+    async def append(self, conversation_id: UUID, messages: list[CachedMessage]):
+        self.loading.pop(conversation_id, None)
+        window = self.cache.get(conversation_id)
+        if window is not None:
+            self.cache.set(conversation_id, (window + tuple(messages))[-CONTEXT_MAX_MESSAGES:])
+
+    async def invalidate(self, conversation_id: UUID):
+        self.loading.pop(conversation_id, None)
+        self.cache.invalidate(conversation_id)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+class RedisHistoryCache(HistoryCache):
+    """Redis list per conversation, shared by every worker process"""
+
+    def __init__(self, url: str, ttl: float):
+        import redis.asyncio as redis
+        from redis.exceptions import WatchError
+
+        self.client = redis.from_url(url)
+        self.ttl = int(ttl)
+        self.WatchError = WatchError
+
+    def _key(self, conversation_id: UUID) -> str:
+        return f"history:{conversation_id}"
+
+    def _version_key(self, conversation_id: UUID) -> str:
+        # Bumped by every write, so a load that overlapped one can tell its window is stale
+        return f"history:{conversation_id}:version"
+
+    @staticmethod
+    def _dump(message: CachedMessage) -> str:
+        return json.dumps([str(message.id), message.role, message.content, message.created_at.isoformat()])
+
+    @staticmethod
+    def _load(raw: bytes) -> CachedMessage:
+        message_id, role, content, created_at = json.loads(raw)
+        return CachedMessage(UUID(message_id), role, content, datetime.fromisoformat(created_at))
+
+    async def get_or_load(self, conversation_id: UUID, loader) -> list[CachedMessage]:
+        key, version_key = self._key(conversation_id), self._version_key(conversation_id)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.get(version_key)
+            raw, version = await pipe.execute()
+        if raw:
+            return [self._load(item) for item in raw]
+
+        window = await loader()
+        if window:
+            async with self.client.pipeline(transaction=True) as pipe:
+                try:
+                    # Store only if no write landed while loading; EXEC fails if one lands now
+                    await pipe.watch(version_key)
+                    if await pipe.get(version_key) != version:
+                        return window
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.rpush(key, *(self._dump(message) for message in window))
+                    pipe.expire(key, self.ttl)
+                    await pipe.execute()
+                except self.WatchError:
+                    pass
+        return window
+
+    async def append(self, conversation_id: UUID, messages: list[CachedMessage]):
+        key = self._key(conversation_id)
+        # RPUSHX only extends a window that already exists
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpushx(key, *(self._dump(message) for message in messages))
+            pipe.ltrim(key, -CONTEXT_MAX_MESSAGES, -1)
+            pipe.expire(key, self.ttl)
+            self._bump(pipe, conversation_id)
+            await pipe.execute()
+
+    async def invalidate(self, conversation_id: UUID):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key(conversation_id))
+            self._bump(pipe, conversation_id)
+            await pipe.execute()
+
+    def _bump(self, pipe, conversation_id: UUID):
+        # Outlives any load in flight; expiring it early only means one load is not cached
+        pipe.incr(self._version_key(conversation_id))
+        pipe.expire(self._version_key(conversation_id), self.ttl)
+
+@lru_cache(maxsize=None)
+def get_history_cache() -> HistoryCache:
+    if HISTORY_CACHE_BACKEND == "memory":
+        if WEB_CONCURRENCY > 1:
+            # Each worker would keep its own copy that other workers' writes never reach
+            raise RuntimeError("HISTORY_CACHE_BACKEND=memory serves stale history with several workers; set it to redis")
+        return MemoryHistoryCache(HISTORY_CACHE_SIZE, HISTORY_CACHE_TTL_SECONDS)
+    if HISTORY_CACHE_BACKEND == "redis":
+        return RedisHistoryCache(REDIS_URL, HISTORY_CACHE_TTL_SECONDS)
+    raise ValueError(f"Unknown HISTORY_CACHE_BACKEND: {HISTORY_CACHE_BACKEND}")
@@ -1,11 +1,87 @@
+import time
+from uuid import uuid4
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from utils.config import DATABASE_URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from utils.metrics import DB_QUERY_SECONDS
+from utils.tracing import start_span, end_span
+from utils.config import DATABASE_URL, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_STATEMENT_CACHE_SIZE, DB_PGBOUNCER, DB_SSL
+
+_pool_waits = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            _pool_waits["count"] += 1
+            _pool_waits["total_seconds"] += waited
+            _pool_waits["max_seconds"] = max(_pool_waits["max_seconds"], waited)
+
+connect_args = {"ssl": DB_SSL}
+if DB_PGBOUNCER:
+    # PgBouncer in transaction mode cannot keep named prepared statements across transactions
+    connect_args["statement_cache_size"] = 0
+    connect_args["prepared_statement_cache_size"] = 0
+    connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+else:
+    connect_args["prepared_statement_cache_size"] = DB_STATEMENT_CACHE_SIZE
+
+engine = create_async_engine(
+    url=DATABASE_URL,
+    echo=DB_ECHO,
+    poolclass=TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    pool_recycle=DB_POOL_RECYCLE,
+    connect_args=connect_args
+)
+_STATEMENT_TYPES = {"select", "insert", "update", "delete", "with"}
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    # Statement text only; parameters can hold user data
+    span = start_span("db.query", statement=" ".join(statement.split())[:300])
+    conn.info.setdefault("query_started", []).append((time.perf_counter(), span))
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started, span = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    end_span(span)
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    DB_QUERY_SECONDS.labels(verb if verb in _STATEMENT_TYPES else "other").observe(elapsed)
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _query_failed(context):
+    # after_cursor_execute never fires for a failed statement
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started and context.cursor is not None:
+        end_span(started.pop()[1], context.original_exception)
 
-engine = create_async_engine(url=DATABASE_URL,echo=True,pool_pre_ping=True,pool_recycle=1800,connect_args={"ssl": "require"})
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
 async def get_db():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "waits": _pool_waits["count"],
+        "wait_seconds_total": round(_pool_waits["total_seconds"], 6),
+        "wait_seconds_max": round(_pool_waits["max_seconds"], 6),
+    }
@@ -1,18 +1,15 @@
 
 import asyncio
+import os
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Boolean,text, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Boolean,text, Integer, Index
 from sqlalchemy.sql import func
 from datetime import datetime, timezone
 
-from utils.config import DATABASE_URL
-
-engine = create_async_engine(url=DATABASE_URL,echo=True,pool_pre_ping=True,pool_recycle=1800,connect_args={"ssl": "require"})
-AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-Base = declarative_base()
+# Single engine and pool for the whole process
+from database.initialization import Base, AsyncSessionLocal, engine, get_db, pool_stats
 
 class UserModel(Base):
     __tablename__ = "users"
@@ -32,6 +29,9 @@ class ConvoModel(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     user_id = Column(UUID, ForeignKey("users.id"), nullable=False)
     title = Column(String, default="New Chat")
+    # Rolling summary of every message up to and including summary_until
+    summary = Column(Text, nullable=True)
+    summary_until = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), 
@@ -39,6 +39,9 @@ class ConvoModel(Base):
         onupdate=func.now())
     user = relationship("UserModel", back_populates="convos")
     messages = relationship("MessageModel", back_populates="convo")
+    __table_args__ = (
+        Index("ix_conversations_user_created", "user_id", "created_at", "id"),
+    )
 
 class MessageModel(Base):
     __tablename__ = "messages"
@@ -48,6 +51,37 @@ class MessageModel(Base):
     content = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     convo = relationship("ConvoModel", back_populates="messages")
+    __table_args__ = (
+        Index("ix_messages_conversation_created", "conversation_id", "created_at", "id"),
+    )
+
+class IngestionJobModel(Base):
+    __tablename__ = "ingestion_jobs"
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    conversation_id = Column(UUID, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    content_hash = Column(String, nullable=True)
+    state = Column(String, nullable=False, default="queued")
+    # The process whose in-memory queue holds the job
+    worker_id = Column(String, nullable=True)
+    chunks_done = Column(Integer, nullable=False, default=0)
+    chunks_total = Column(Integer, nullable=True)
+    detail = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now())
+    __table_args__ = (
+        Index("ix_ingestion_jobs_document_latest", "conversation_id", "filename", "created_at", "id"),
+    )
+
+class IngestionWorkerModel(Base):
+    """One row per live app process, so jobs left by a dead one can be told apart from merely queued ones"""
+    __tablename__ = "ingestion_workers"
+    id = Column(String, primary_key=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    heartbeat_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 class RefreshTokenModel(Base):
     __tablename__ = "refresh_tokens"
@@ -66,6 +100,9 @@ class RefreshTokenModel(Base):
         server_default=func.now()
     )
     user = relationship("UserModel")
+    __table_args__ = (
+        Index("ix_refresh_tokens_token_hash_live", "token_hash", postgresql_where=text("is_revoked = false")),
+    )
 
 class OTPVerificationModel(Base):
     __tablename__ = "otp_verifications"
@@ -76,15 +113,23 @@ class OTPVerificationModel(Base):
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     expires_at = Column(DateTime(timezone=True), nullable=False)
     is_used = Column(Boolean, default=False)
+    __table_args__ = (
+        Index("ix_otp_verifications_email_pending", "email", "expires_at", postgresql_where=text("is_used = false")),
+    )
+
+def _alembic_config():
+    from alembic.config import Config
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return Config(os.path.join(root, "alembic.ini"))
 
 async def create_tables():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    print("✅ Tables created in Supabase!")
+    """Bring the schema up to the latest migration"""
+    from alembic import command
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
-        yield session
+    # env.py runs its own event loop, so keep it off this one
+    await asyncio.to_thread(command.upgrade, _alembic_config(), "head")
+    print("✅ Tables created in Supabase!")
 
 if __name__ == "__main__":
     asyncio.run(create_tables())
\ No newline at end of file
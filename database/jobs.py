@@ -0,0 +1,134 @@
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import func
+from datetime import timedelta
+from uuid import UUID, uuid4
+
+from database.initializations import ConvoModel, IngestionJobModel, IngestionWorkerModel, AsyncSessionLocal
+from utils.config import INGEST_WORKER_STALE_SECONDS
+
+ACTIVE_STATES = ("queued", "running")
+
+# Identifies this process; jobs are queued in its memory, so they live and die with it
+WORKER_ID = uuid4().hex
+
+class DocumentInProgress(Exception):
+    """Another upload of the same document is still queued or running"""
+
+def job_to_dict(job: IngestionJobModel):
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "state": job.state,
+        "chunks_done": job.chunks_done,
+        "chunks_total": job.chunks_total,
+        "detail": job.detail,
+        "created_at": str(job.created_at),
+        "updated_at": str(job.updated_at) if job.updated_at else None
+    }
+
+async def create_ingestion_job(db: AsyncSession, conversation_id: UUID, filename: str, content_hash: str, state: str = "queued", detail: str | None = None):
+    job = IngestionJobModel(
+        conversation_id=conversation_id,
+        filename=filename,
+        content_hash=content_hash,
+        state=state,
+        detail=detail,
+        worker_id=WORKER_ID if state in ACTIVE_STATES else None
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+async def lock_document(db: AsyncSession, conversation_id: UUID, filename: str):
+    """Serialize uploads of one document (conversation + filename) until this session's transaction ends"""
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtextextended(f"{conversation_id}:{filename}", 0))))
+
+async def find_ingested_document(db: AsyncSession, conversation_id: UUID, filename: str, content_hash: str):
+    """The document's latest job, if it left exactly these bytes in the index.
+    Only the latest counts: a later upload under the same filename replaces the earlier chunks."""
+    result = await db.execute(
+        select(IngestionJobModel)
+        .where(
+            IngestionJobModel.conversation_id == conversation_id,
+            IngestionJobModel.filename == filename
+        )
+        .order_by(IngestionJobModel.created_at.desc(), IngestionJobModel.id.desc())
+        .limit(1)
+    )
+    latest = result.scalar_one_or_none()
+    if latest is None:
+        return None
+    if latest.state in ACTIVE_STATES:
+        raise DocumentInProgress()
+    if latest.state == "succeeded" and latest.content_hash == content_hash:
+        return latest
+    return None
+
+async def update_ingestion_job(job_id: UUID, **fields):
+    """Update a job from a background worker, outside any request session"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(IngestionJobModel)
+            .where(IngestionJobModel.id == job_id)
+            .values(**fields, updated_at=func.now())
+        )
+        await db.commit()
+
+async def get_ingestion_job(db: AsyncSession, conversation_id: UUID, job_id: UUID, user_id: UUID):
+    """Fetch a job only if its conversation belongs to the user"""
+    result = await db.execute(
+        select(IngestionJobModel)
+        .join(ConvoModel, ConvoModel.id == IngestionJobModel.conversation_id)
+        .where(
+            IngestionJobModel.id == job_id,
+            IngestionJobModel.conversation_id == conversation_id,
+            ConvoModel.user_id == user_id
+        )
+    )
+    job = result.scalar_one_or_none()
+    return job_to_dict(job) if job is not None else None
+
+async def heartbeat_worker():
+    """Record that this process, and so every job it owns, is still alive"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(IngestionWorkerModel)
+            .values(id=WORKER_ID)
+            .on_conflict_do_update(index_elements=[IngestionWorkerModel.id], set_={"heartbeat_at": func.now()})
+        )
+        await db.commit()
+
+async def retire_worker():
+    """Drop this process's heartbeat on a clean shutdown"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(IngestionWorkerModel).where(IngestionWorkerModel.id == WORKER_ID))
+        await db.commit()
+
+async def fail_interrupted_jobs():
+    """Fail active jobs whose owning process stopped heartbeating, so pollers get a clean answer.
+    How long a job waits or runs does not matter while its owner is alive."""
+    stale = timedelta(seconds=INGEST_WORKER_STALE_SECONDS)
+    live = select(IngestionWorkerModel.id).where(IngestionWorkerModel.heartbeat_at > func.now() - stale)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(IngestionJobModel)
+            .where(
+                IngestionJobModel.state.in_(ACTIVE_STATES),
+                or_(IngestionJobModel.worker_id.is_(None), IngestionJobModel.worker_id != WORKER_ID),
+                or_(IngestionJobModel.worker_id.is_(None), IngestionJobModel.worker_id.not_in(live)),
+                # Grace for a process whose first heartbeat has not landed yet
+                IngestionJobModel.created_at < func.now() - stale
+            )
+            .values(
+                state="failed",
+                detail="Interrupted by a worker restart, please upload the document again",
+                updated_at=func.now()
+            )
+        )
+        await db.execute(delete(IngestionWorkerModel).where(IngestionWorkerModel.heartbeat_at < func.now() - stale * 10))
+        await db.commit()
+        return result.rowcount
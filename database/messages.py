@@ -1,75 +1,145 @@
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, tuple_, and_
 from sqlalchemy.sql import func
 from uuid import UUID
+from datetime import datetime
+import time
 
 from database.initializations import ConvoModel, MessageModel
+from database.pagination import encode_cursor, decode_cursor
+from database.history_cache import get_history_cache, CachedMessage
+from utils.config import CONTEXT_MAX_MESSAGES
+from utils.metrics import HISTORY_LOAD_SECONDS
 
-async def get_conversation_messages(db: AsyncSession, conversation_id: UUID, user_id: UUID):
+async def get_conversation_messages(
+    db: AsyncSession,
+    conversation_id: UUID,
+    user_id: UUID,
+    limit: int = 50,
+    before: str | None = None,
+    after: str | None = None
+):
+    """One page of messages, oldest first. Ownership check and page fetch share one query."""
 
-    convo_result = await db.execute(
-        select(ConvoModel).where(
-            ConvoModel.id == conversation_id,
-            ConvoModel.user_id == user_id
-        )
+    key = tuple_(MessageModel.created_at, MessageModel.id)
+    join_on = [MessageModel.conversation_id == ConvoModel.id]
+    if after:
+        join_on.append(key > tuple_(*decode_cursor(after)))
+        order = [MessageModel.created_at.asc(), MessageModel.id.asc()]
+    else:
+        if before:
+            join_on.append(key < tuple_(*decode_cursor(before)))
+        order = [MessageModel.created_at.desc(), MessageModel.id.desc()]
+
+    # LEFT JOIN keeps one row for an owned conversation even when the page is empty
+    result = await db.execute(
+        select(MessageModel.id, MessageModel.role, MessageModel.content, MessageModel.created_at)
+        .select_from(ConvoModel)
+        .outerjoin(MessageModel, and_(*join_on))
+        .where(ConvoModel.id == conversation_id, ConvoModel.user_id == user_id)
+        .order_by(*order)
+        .limit(limit + 1)
     )
-    convo = convo_result.scalar_one_or_none()
-    
-    if not convo:
+    rows = result.all()
+    if not rows:
         return None
 
-    messages_result = await db.execute(
-        select(MessageModel)
-        .where(MessageModel.conversation_id == conversation_id)
-        .order_by(MessageModel.created_at.asc())
-    )
-    messages = messages_result.scalars().all()
-    
-    return [
+    rows = [row for row in rows if row.id is not None]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not after:
+        rows.reverse()
+
+    items = [
         {
-            "id": msg.id,
-            "role": msg.role,
-            "content": msg.content,
-            "created_at": str(msg.created_at)
+            "id": row.id,
+            "role": row.role,
+            "content": row.content,
+            "created_at": str(row.created_at)
         }
-        for msg in messages
+        for row in rows
     ]
+    return {
+        "items": items,
+        # Older page exists only if we saw more rows going backwards (or came forward from a cursor)
+        "before_cursor": encode_cursor(rows[0].created_at, rows[0].id) if rows and (has_more or after) else None,
+        # Always offered so clients can poll for newer messages
+        "after_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if rows else after
+    }
 
-async def get_recent_messages(db: AsyncSession, conversation_id: UUID, limit: int = 20):
-    """Get recent messages for chat context"""
+async def get_recent_messages(db: AsyncSession, conversation_id: UUID, limit: int | None = 20, since: datetime | None = None):
+    """Get recent messages for chat context, optionally only those newer than since"""
+    query = select(MessageModel).where(MessageModel.conversation_id == conversation_id)
+    if since is not None:
+        query = query.where(MessageModel.created_at > since)
     result = await db.execute(
-        select(MessageModel)
-        .where(MessageModel.conversation_id == conversation_id)
-        .order_by(MessageModel.created_at.desc())
+        query
+        .order_by(MessageModel.created_at.desc(), MessageModel.id.desc())
         .limit(limit)
     )
     messages = result.scalars().all()
     return list(reversed(messages))
 
+async def get_chat_context(db: AsyncSession, conversation_id: UUID, user_id: UUID):
+    """Owned conversation and its recent history, oldest first, or None.
+    One query either way: the history cache answers the history part when it can."""
+    loaded = None
+    cache = "hit"
+
+    async def load():
+        nonlocal loaded, cache
+        cache = "miss"
+        # LEFT JOIN keeps one row for an owned conversation that has no messages yet
+        result = await db.execute(
+            select(ConvoModel, MessageModel.id, MessageModel.role, MessageModel.content, MessageModel.created_at)
+            .select_from(ConvoModel)
+            .outerjoin(MessageModel, MessageModel.conversation_id == ConvoModel.id)
+            .where(ConvoModel.id == conversation_id, ConvoModel.user_id == user_id)
+            .order_by(MessageModel.created_at.desc(), MessageModel.id.desc())
+            .limit(CONTEXT_MAX_MESSAGES)
+        )
+        rows = result.all()
+        if not rows:
+            # Raised rather than returned so nothing gets cached for a conversation the caller cannot see
+            raise LookupError(conversation_id)
+        loaded = rows[0][0]
+        return [CachedMessage(row.id, row.role, row.content, row.created_at) for row in reversed(rows) if row.id is not None]
+
+    started = time.perf_counter()
+    try:
+        window = await get_history_cache().get_or_load(conversation_id, load)
+        convo = loaded or await verify_conversation_access(db, conversation_id, user_id)
+    except LookupError:
+        return None
+    finally:
+        HISTORY_LOAD_SECONDS.labels(cache).observe(time.perf_counter() - started)
+    if convo is None:
+        return None
+    return convo, window
+
 async def save_chat_messages(db: AsyncSession, conversation_id: UUID, user_message: str, ai_response: str):
-    """Save both user and AI messages"""
-    user_msg = MessageModel(
-        conversation_id=conversation_id,
-        role="user",
-        content=user_message,
+    """Save both user and AI messages and bump the conversation, all in one statement"""
+    # clock_timestamp() differs per row, so the reply always sorts after the question
+    inserted = (
+        insert(MessageModel)
+        .values([
+            {"conversation_id": conversation_id, "role": "user", "content": user_message, "created_at": func.clock_timestamp()},
+            {"conversation_id": conversation_id, "role": "assistant", "content": ai_response, "created_at": func.clock_timestamp()},
+        ])
+        .returning(MessageModel.id, MessageModel.role, MessageModel.content, MessageModel.created_at)
+        .cte("inserted")
     )
-    
-    ai_msg = MessageModel(
-        conversation_id=conversation_id,
-        role="assistant",
-        content=ai_response,
+    touched = (
+        update(ConvoModel)
+        .where(ConvoModel.id == conversation_id)
+        .values(updated_at=func.now())
+        .cte("touched")
     )
-    
-    db.add(user_msg)
-    db.add(ai_msg)
-
-    convo = await db.get(ConvoModel, conversation_id)
-    if convo:
-        convo.updated_at = func.now()
-
+    result = await db.execute(select(inserted).add_cte(touched).order_by(inserted.c.created_at))
+    user_msg, ai_msg = [CachedMessage(row.id, row.role, row.content, row.created_at) for row in result.all()]
     await db.commit()
-    await db.refresh(ai_msg)
+    await get_history_cache().append(conversation_id, [user_msg, ai_msg])
     
     return {
         "id": ai_msg.id,
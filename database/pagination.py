@@ -0,0 +1,17 @@
+import base64
+from datetime import datetime
+from uuid import UUID
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """Opaque keyset cursor for (created_at, id)"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Raises ValueError for cursors this module did not produce"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
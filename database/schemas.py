@@ -1,78 +1,11 @@
-from database.initialization import Base, AsyncSessionLocal, engine
+# Models live in database/initializations.py; re-exported here so both paths share one Base and engine
 import asyncio
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Boolean,text, Integer
-from sqlalchemy.sql import func
-from datetime import datetime, timezone
 
-class UserModel(Base):
-    __tablename__ = "users"
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    email = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    convos = relationship("ConvoModel",back_populates="user")
-    refresh_tokens = relationship(
-        "RefreshTokenModel",
-        back_populates="user",
-        cascade="all, delete-orphan"
-    )
-
-class ConvoModel(Base):
-    __tablename__ = "conversations"
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    user_id = Column(UUID, ForeignKey("users.id"), nullable=False)
-    title = Column(String, default="New Chat")
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(
-        DateTime(timezone=True), 
-        server_default=func.now(),
-        onupdate=func.now())
-    user = relationship("UserModel", back_populates="convos")
-    messages = relationship("MessageModel", back_populates="convo")
-
-class MessageModel(Base):
-    __tablename__ = "messages"
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    conversation_id = Column(UUID, ForeignKey("conversations.id"), nullable=False)
-    role = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    convo = relationship("ConvoModel", back_populates="messages")
-
-class RefreshTokenModel(Base):
-    __tablename__ = "refresh_tokens"
-    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    user_id = Column(
-        UUID,
-        ForeignKey("users.id", ondelete="CASCADE"),
-        nullable=False,
-        index=True
-    )
-    token_hash = Column(String, nullable=False)
-    expires_at = Column(DateTime(timezone=True), nullable=False)
-    is_revoked = Column(Boolean, default=False)
-    created_at = Column(
-        DateTime(timezone=True),
-        server_default=func.now()
-    )
-    user = relationship("UserModel")
-
-class OTPVerificationModel(Base):
-    __tablename__ = "otp_verifications"
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, index=True, nullable=False)
-    otp_code = Column(String(6), nullable=False)
-    hashed_password = Column(String, nullable=False)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    expires_at = Column(DateTime(timezone=True), nullable=False)
-    is_used = Column(Boolean, default=False)
-
-async def create_tables():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    print("✅ Tables created in Supabase!")
+from database.initializations import (
+    Base, AsyncSessionLocal, engine,
+    UserModel, ConvoModel, MessageModel, IngestionJobModel, RefreshTokenModel, OTPVerificationModel,
+    create_tables
+)
 
 if __name__ == "__main__":
-    asyncio.run(create_tables())
\ No newline at end of file
+    asyncio.run(create_tables())
@@ -1,11 +1,51 @@
 
-from fastapi import FastAPI
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 
 from routers.user import router as user_router
 from routers.conversation import router as conversation_router
 from routers.messages import router as message_router
+from routers.documents import router as document_router
+
+from AI.ingestion import start_ingestion_workers, stop_ingestion_workers
+from utils.lifecycle import warmup, readiness
+from AI.tool_cache import tool_cache_stats
+from AI.resilience import breaker_stats
+from AI.llm_scheduler import scheduler
+from AI.embeddings import embeddings
+from database.initializations import pool_stats
+from database.history_cache import get_history_cache
+from utils.auth import user_cache
+from utils.metrics import HTTP_REQUEST_SECONDS, register_stats, render
+from utils.tracing import trace, get_span_exporter
+
+register_stats("db_pool", "Database connection pool", pool_stats)
+register_stats("user_cache", "Authenticated user cache", user_cache.stats)
+register_stats("embedding_cache", "Embedding cache", lambda: {**embeddings.stats, "hit_rate": embeddings.hit_rate()})
+# Only the in-process backend keeps its own counters
+register_stats("history_cache", "Conversation history cache", lambda: getattr(get_history_cache(), "stats", dict)())
+register_stats("tool_cache", "Web tool result cache", tool_cache_stats, label="tool")
+register_stats("circuit_breaker", "Tool circuit breakers", breaker_stats, label="tool")
+register_stats("llm_scheduler", "LLM rate-budget scheduler", scheduler.stats)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warmup runs in the background; /ready reports when it has finished
+    # Fails startup on a cache backend that cannot work with this deployment
+    get_history_cache()
+    warmup_task = asyncio.create_task(warmup())
+    start_ingestion_workers()
+    yield
+    warmup_task.cancel()
+    await stop_ingestion_workers()
+    get_span_exporter().shutdown()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="Chatbot Wrapper Backend",
     description="""
 Built by **Aarush Srivatsa**  
@@ -13,6 +53,39 @@ GitHub Docs Link: https://github.com/AarushSrivatsa/Chatbot-Wrapper-Project-Back
 Linkedin Profile: https://www.linkedin.com/in/aarushsrivatsa/
 """)
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started = time.perf_counter()
+    with trace("http.request", request.headers.get("traceparent"), method=request.method) as root:
+        response = await call_next(request)
+        # The route template, not the raw path, so ids never become label values
+        route = request.scope.get("route")
+        route = route.path if route is not None else "unmatched"
+        if root is not None:
+            root.name = f"{request.method} {route}"
+            root.set(route=route, status_code=response.status_code)
+            response.headers["X-Trace-Id"] = root.trace_id
+    HTTP_REQUEST_SECONDS.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+    return response
+
 app.include_router(user_router)
 app.include_router(conversation_router)
 app.include_router(message_router)
+app.include_router(document_router)
+
+@app.get("/ready", tags=["health"])
+async def ready():
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=readiness)
+    return readiness
+
+@app.get("/stats", tags=["health"])
+async def stats():
+    """Web tool cache effectiveness, circuit breaker state per tool, LLM queue depth and wait"""
+    return {"tools": tool_cache_stats(), "breakers": breaker_stats(), "llm": scheduler.stats()}
+
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,50 @@
+"""Composite and partial indexes for the hot query paths
+
+Revision ID: 0003_hot_query_indexes
+Revises: 0002_ingestion_jobs
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_hot_query_indexes"
+down_revision: Union[str, Sequence[str], None] = "0002_ingestion_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Chat history and message pages: filter by conversation, keyset on (created_at, id)
+    op.create_index("ix_messages_conversation_created", "messages", ["conversation_id", "created_at", "id"])
+    # Conversation list pages: filter by user, keyset on (created_at, id)
+    op.create_index("ix_conversations_user_created", "conversations", ["user_id", "created_at", "id"])
+    # Refresh: only live tokens are ever looked up by hash
+    op.create_index(
+        "ix_refresh_tokens_token_hash_live", "refresh_tokens", ["token_hash"],
+        postgresql_where=sa.text("is_revoked = false")
+    )
+    # Pending OTP checks: email + expiry over unused codes
+    op.create_index(
+        "ix_otp_verifications_email_pending", "otp_verifications", ["email", "expires_at"],
+        postgresql_where=sa.text("is_used = false")
+    )
+    # Duplicate-upload check
+    op.create_index(
+        "ix_ingestion_jobs_conversation_hash_done", "ingestion_jobs", ["conversation_id", "content_hash"],
+        postgresql_where=sa.text("state = 'succeeded'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_ingestion_jobs_conversation_hash_done", table_name="ingestion_jobs")
+    op.drop_index("ix_otp_verifications_email_pending", table_name="otp_verifications")
+    op.drop_index("ix_refresh_tokens_token_hash_live", table_name="refresh_tokens")
+    op.drop_index("ix_conversations_user_created", table_name="conversations")
+    op.drop_index("ix_messages_conversation_created", table_name="messages")
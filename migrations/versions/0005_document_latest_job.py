@@ -0,0 +1,36 @@
+"""Look up a document's latest ingestion job by filename
+
+Revision ID: 0005_document_latest_job
+Revises: 0004_conversation_summary
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_document_latest_job"
+down_revision: Union[str, Sequence[str], None] = "0004_conversation_summary"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Re-upload check: the newest job for (conversation, filename) decides, whatever its state
+    op.create_index(
+        "ix_ingestion_jobs_document_latest", "ingestion_jobs", ["conversation_id", "filename", "created_at", "id"]
+    )
+    op.drop_index("ix_ingestion_jobs_conversation_hash_done", table_name="ingestion_jobs")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        "ix_ingestion_jobs_conversation_hash_done", "ingestion_jobs", ["conversation_id", "content_hash"],
+        postgresql_where=sa.text("state = 'succeeded'")
+    )
+    op.drop_index("ix_ingestion_jobs_document_latest", table_name="ingestion_jobs")
@@ -0,0 +1,37 @@
+"""Ingestion job ownership and worker heartbeats
+
+Revision ID: 0006_ingestion_workers
+Revises: 0005_document_latest_job
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_ingestion_workers"
+down_revision: Union[str, Sequence[str], None] = "0005_document_latest_job"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "ingestion_workers",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # Jobs from before this revision have no owner and are swept as orphans once old enough
+    op.add_column("ingestion_jobs", sa.Column("worker_id", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("ingestion_jobs", "worker_id")
+    op.drop_table("ingestion_workers")
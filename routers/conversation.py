@@ -1,14 +1,14 @@
 # FastAPI
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from uuid import UUID
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from database.initializations import get_db
 from database.conversations import create_conversation, get_user_conversations, delete_conversation_with_cleanup
 
-from schemas import ConvoCreate, ConvoResponse, DeleteConvoResponse
+from schemas import ConvoCreate, ConvoResponse, ConvoPage, DeleteConvoResponse
 
-from utils.auth import get_current_user
+from utils.auth import get_current_user, get_read_only_user
 from AI.rag import clear_rag
 
 router = APIRouter(prefix='/conversations',tags=['conversations'])
@@ -21,12 +21,20 @@ async def create_convo(
 ):
     return await create_conversation(db, current_user.id, convo_data.title)
 
-@router.get("/", response_model=list[ConvoResponse])
+@router.get("/", response_model=ConvoPage)
 async def list_conversations(
-    current_user = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = None,
+    after: str | None = None,
+    current_user = Depends(get_read_only_user),
     db: AsyncSession = Depends(get_db)
 ):
-    return await get_user_conversations(db, current_user.id)
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    try:
+        return await get_user_conversations(db, current_user.id, limit, before, after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.delete("/{conversation_id}",response_model=DeleteConvoResponse)
 async def delete_conversation(
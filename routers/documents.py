@@ -0,0 +1,26 @@
+
+from fastapi import APIRouter, Depends, HTTPException
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from schemas import DocumentJobResponse
+
+from database.initializations import get_db
+from database.jobs import get_ingestion_job
+
+from utils.auth import get_read_only_user
+
+router = APIRouter(prefix="/conversations/{conversation_id}/documents", tags=["documents"])
+
+@router.get("/jobs/{job_id}", response_model=DocumentJobResponse)
+async def get_document_job(
+    conversation_id: UUID,
+    job_id: UUID,
+    current_user = Depends(get_read_only_user),
+    db: AsyncSession = Depends(get_db)
+):
+    job = await get_ingestion_job(db, conversation_id, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
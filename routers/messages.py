@@ -1,31 +1,61 @@
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from fastapi.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, status
+from fastapi.responses import StreamingResponse
 from uuid import UUID
+import json
+import time
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from schemas import MessageResponse, ChatRequest, PostDocumentResponse
+from schemas import MessageResponse, MessagePage, ChatRequest, DocumentJobResponse
 
 from database.initializations import get_db, ConvoModel, AsyncSessionLocal
-from database.messages import get_conversation_messages, get_recent_messages, save_chat_messages, verify_conversation_access
+from database.messages import get_conversation_messages, get_chat_context, save_chat_messages
 
-from utils.auth import get_current_user
+from utils.auth import get_current_user, get_read_only_user
 
-from AI.bot import get_ai_response
-from AI.rag import add_to_rag
+from AI.bot import get_ai_response, stream_ai_response, AgentUnavailable
+from AI.context import fit_history
+from AI.summary import schedule_summary_refresh
+from database.jobs import create_ingestion_job, update_ingestion_job, find_ingested_document, lock_document, job_to_dict, DocumentInProgress
+from AI.ingestion import enqueue_ingestion, IngestionUnavailable
+from AI.rag import document_hash
+from utils.config import CONTEXT_TOKEN_BUDGET, SUMMARY_TRIGGER_MESSAGES, SUMMARY_PENDING_TOKENS
+from utils.metrics import timed, CHAT_TURN_SECONDS
 
 router = APIRouter(prefix="/conversations/{conversation_id}/messages", tags=["messages"])
 message_limit = 25 
 
-@router.get("/", response_model=list[MessageResponse])
+async def load_context(db: AsyncSession, conversation_id: UUID, user_id: UUID, user_message: str):
+    """Owned conversation, the unsummarized history to send, and whether older messages need summarizing"""
+    context = await get_chat_context(db, conversation_id, user_id)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    convo, messages = context
+    if convo.summary_until is not None:
+        messages = [message for message in messages if message.created_at > convo.summary_until]
+    overflow, _ = fit_history(messages, convo.summary, user_message)
+    # Overflow stays in the prompt until the summary covers it, up to a hard token ceiling;
+    # whatever does not fit even that (a pasted document, failing refreshes) is summarized at once
+    dropped, window = fit_history(messages, convo.summary, user_message, CONTEXT_TOKEN_BUDGET + SUMMARY_PENDING_TOKENS)
+    return convo, window, len(overflow) >= SUMMARY_TRIGGER_MESSAGES or bool(dropped)
+
+@router.get("/", response_model=MessagePage)
 async def get_messages(
     conversation_id: UUID,
-    current_user = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = None,
+    after: str | None = None,
+    current_user = Depends(get_read_only_user),
     db: AsyncSession = Depends(get_db)
 ):
-    messages = await get_conversation_messages(db, conversation_id, current_user.id)
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    try:
+        messages = await get_conversation_messages(db, conversation_id, current_user.id, limit, before, after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     if messages is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return messages
@@ -37,24 +67,83 @@ async def post_message(
     current_user = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    
-    convo = await verify_conversation_access(db, conversation_id, current_user.id)
-    if not convo:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    messages = await get_recent_messages(db, conversation_id, limit=20)
-    ai_response = await get_ai_response(
-        user_message=chat_request.message,
-        conversation_id=conversation_id,
-        messages=messages
+    with timed(CHAT_TURN_SECONDS, with_outcome=True, mode="sync"):
+        convo, messages, needs_summary = await load_context(db, conversation_id, current_user.id, chat_request.message)
+        try:
+            ai_response = await get_ai_response(
+                user_message=chat_request.message,
+                conversation_id=conversation_id,
+                messages=messages,
+                summary=convo.summary,
+                user_id=current_user.id
+            )
+        except AgentUnavailable:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The assistant is unavailable right now, please try again"
+            )
+        saved = await save_chat_messages(db, conversation_id, chat_request.message, ai_response)
+    if needs_summary:
+        schedule_summary_refresh(conversation_id)
+    return saved
+
+@router.post("/stream")
+async def post_message_stream(
+    conversation_id: UUID,
+    chat_request: ChatRequest,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Send message and stream the reply as Server-Sent Events"""
+    started = time.perf_counter()
+    convo, messages, needs_summary = await load_context(db, conversation_id, current_user.id, chat_request.message)
+    summary = convo.summary
+
+    async def event_stream():
+        ai_response = ""
+        outcome = "error"
+        try:
+            async for event in stream_ai_response(
+                user_message=chat_request.message,
+                conversation_id=conversation_id,
+                messages=messages,
+                summary=summary,
+                user_id=current_user.id
+            ):
+                if event["type"] == "final":
+                    ai_response = event["content"]
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+            # Nothing to keep when even the fallback failed; the client already got an error event
+            if ai_response is None:
+                return
+
+            # The request-scoped session may already be closed once streaming starts
+            async with AsyncSessionLocal() as save_db:
+                saved = await save_chat_messages(save_db, conversation_id, chat_request.message, ai_response)
+            if needs_summary:
+                schedule_summary_refresh(conversation_id)
+            outcome = "ok"
+            yield f"event: done\ndata: {json.dumps(saved, default=str)}\n\n"
+        finally:
+            # The route returns once headers are sent; the turn ends when the stream does
+            CHAT_TURN_SECONDS.labels("stream", outcome).observe(time.perf_counter() - started)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    return await save_chat_messages(db, conversation_id, chat_request.message, ai_response)
 
-@router.post("/document",response_model=PostDocumentResponse)
+@router.post("/document", response_model=DocumentJobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def post_document(
     conversation_id: UUID,
     file: UploadFile = File(...),
     current_user = Depends(get_current_user),
 ):
+    """Queue a document for ingestion; poll the returned job for progress"""
+    file_bytes = await file.read()
     async with AsyncSessionLocal() as db:
         result = await db.execute(
             select(ConvoModel).where(
@@ -65,25 +154,30 @@ async def post_document(
         convo = result.scalar_one_or_none()
         if not convo:
             raise HTTPException(status_code=404, detail="Conversation not found")
-    file_bytes = await file.read()
+        content_hash = document_hash(file_bytes)
+        # Held until the job row is committed, so two uploads of one document cannot both pass the check
+        await lock_document(db, conversation_id, file.filename)
+        try:
+            ingested = await find_ingested_document(db, conversation_id, file.filename, content_hash)
+        except DocumentInProgress:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This document is still being processed, try again once it finishes"
+            )
+        if ingested:
+            job = await create_ingestion_job(
+                db, conversation_id, file.filename, content_hash,
+                state="succeeded", detail="Identical document already ingested, skipped"
+            )
+            return job_to_dict(job)
+        job = await create_ingestion_job(db, conversation_id, file.filename, content_hash)
 
     try:
-        rag_result = await run_in_threadpool(
-            add_to_rag,         
-            conversation_id,
-            file_bytes,
-            file.filename
-        )
-        return {
-            "message": "Document added successfully",
-            "filename": file.filename,
-            "details": rag_result
-        }
-    except Exception as e:
-        print("RAG ERROR:", repr(e))
+        enqueue_ingestion(job.id, conversation_id, file_bytes, file.filename)
+    except IngestionUnavailable as e:
+        await update_ingestion_job(job.id, state="failed", detail=str(e))
         raise HTTPException(
-            status_code=500,
-            detail="Failed to add document"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many documents being processed, try again shortly"
         )
-
-
+    return job_to_dict(job)
@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from database.initializations import get_db, UserModel, OTPVerificationModel, RefreshTokenModel
 from sqlalchemy import select
 from datetime import datetime, timezone, timedelta
-from utils.auth import hash_password, create_tokens, verify_password, hash_refresh_token
+from utils.auth import hash_password, create_tokens, verify_password, hash_refresh_token, invalidate_cached_user
 from utils.email import send_otp
 
 router = APIRouter(prefix="/auth",tags=['auth'])
@@ -37,7 +37,7 @@ async def send_otp_route(
             detail="OTP already sent. Please wait before requesting a new one."
         )
     
-    hashed_password = hash_password(request.password)
+    hashed_password = await hash_password(request.password)
 
     otp = send_otp(bg, email)
 
@@ -98,7 +98,7 @@ async def verify_otp_route(
     await db.refresh(new_user)
     
     # Generate tokens for the new user
-    tokens = await create_tokens(new_user.id, db)
+    tokens = await create_tokens(new_user.id, db, email=new_user.email)
     
     return {
         "message": "Account created successfully",
@@ -129,14 +129,14 @@ async def login_route(
         )
     
     # Verify password
-    if not verify_password(user.hashed_password, request.password):
+    if not await verify_password(user.hashed_password, request.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
     # Generate tokens
-    tokens = await create_tokens(user.id, db)
+    tokens = await create_tokens(user.id, db, email=user.email)
     
     return {
         "message": "Login successful",
@@ -280,7 +280,7 @@ async def reset_password_route(
     otp_record.is_used = True
     
     # Update user password
-    user.hashed_password = hash_password(request.new_password)
+    user.hashed_password = await hash_password(request.new_password)
 
     result = await db.execute(
         select(RefreshTokenModel).where(
@@ -294,9 +294,10 @@ async def reset_password_route(
         token.is_revoked = True
     
     await db.commit()
+    invalidate_cached_user(user.id)
     
     # Generate new tokens
-    tokens = await create_tokens(user.id, db)
+    tokens = await create_tokens(user.id, db, email=user.email)
     
     return {
         "message": "Password reset successfully",
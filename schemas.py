@@ -39,6 +39,11 @@ class ConvoResponse(BaseModel):
     created_at: str
     updated_at: str | None
 
+class ConvoPage(BaseModel):
+    items: list[ConvoResponse]
+    before_cursor: str | None
+    after_cursor: str | None
+
 class DeleteConvoResponse(BaseModel):
     result : str
 
@@ -48,8 +53,20 @@ class MessageResponse(BaseModel):
     content: str
     created_at: str
 
+class MessagePage(BaseModel):
+    items: list[MessageResponse]
+    before_cursor: str | None
+    after_cursor: str | None
+
 class ChatRequest(BaseModel):
     message: str
 
-class PostDocumentResponse(BaseModel):
-    text: str
\ No newline at end of file
+class DocumentJobResponse(BaseModel):
+    id: UUID
+    filename: str
+    state: str
+    chunks_done: int
+    chunks_total: int | None
+    detail: str | None
+    created_at: str
+    updated_at: str | None
\ No newline at end of file
@@ -0,0 +1,67 @@
+import AI.resilience as resilience
+from AI.resilience import CircuitBreaker
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def open_breaker(monkeypatch) -> tuple[CircuitBreaker, Clock]:
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    breaker = CircuitBreaker("search", failure_threshold=3, reset_seconds=30)
+    for _ in range(3):
+        assert breaker.acquire()
+        breaker.record_failure()
+    return breaker, clock
+
+def test_opens_after_consecutive_failures(monkeypatch):
+    breaker, _ = open_breaker(monkeypatch)
+    assert breaker.stats()["state"] == "open"
+    assert breaker.stats()["times_opened"] == 1
+    assert not breaker.acquire()
+
+def test_a_success_resets_the_failure_count():
+    breaker = CircuitBreaker("search", failure_threshold=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "closed"
+
+def test_half_open_lets_a_single_probe_through(monkeypatch):
+    breaker, clock = open_breaker(monkeypatch)
+    clock.now += 31
+    assert breaker.stats()["state"] == "half-open"
+    assert breaker.acquire()
+    assert not breaker.acquire()
+    assert not breaker.available()
+
+def test_successful_probe_closes(monkeypatch):
+    breaker, clock = open_breaker(monkeypatch)
+    clock.now += 31
+    assert breaker.acquire()
+    breaker.record_success()
+    assert breaker.stats()["state"] == "closed"
+    assert breaker.acquire() and breaker.acquire()
+
+def test_failed_probe_reopens_for_another_period(monkeypatch):
+    breaker, clock = open_breaker(monkeypatch)
+    clock.now += 31
+    assert breaker.acquire()
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "open"
+    assert breaker.stats()["times_opened"] == 1
+    clock.now += 29
+    assert not breaker.acquire()
+    clock.now += 2
+    assert breaker.acquire()
+
+def test_released_probe_frees_the_slot(monkeypatch):
+    breaker, clock = open_breaker(monkeypatch)
+    clock.now += 31
+    assert breaker.acquire()
+    breaker.release()
+    assert breaker.acquire()
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from AI.context import fit_history, message_tokens, split_recent, count_tokens, MESSAGE_OVERHEAD_TOKENS
+
+T0 = datetime(2026, 1, 1)
+
+def turns(count: int, words: int = 50) -> list:
+    """Alternating user/assistant messages; each pair shares a timestamp like a saved turn"""
+    return [
+        SimpleNamespace(role="user" if i % 2 == 0 else "assistant", content="word " * words, created_at=T0 + timedelta(minutes=i // 2))
+        for i in range(count)
+    ]
+
+def cost(messages) -> int:
+    # Plus a little for the empty new message, well short of another message
+    return sum(message_tokens(m) for m in messages) + 10
+
+def test_everything_fits():
+    messages = turns(6)
+    overflow, window = fit_history(messages, budget=cost(messages) + 100)
+    assert overflow == [] and window == messages
+
+def test_oldest_messages_overflow_first():
+    messages = turns(10)
+    overflow, window = fit_history(messages, budget=cost(messages[-4:]))
+    assert overflow == messages[:6] and window == messages[6:]
+
+def test_window_starts_on_a_user_turn():
+    messages = turns(10)
+    # Room for three messages: the oldest of them is an assistant reply, so it is left out
+    _, window = fit_history(messages, budget=cost(messages[-3:]))
+    assert window == messages[-2:]
+    assert window[0].role == "user"
+
+def test_summary_and_new_message_take_budget():
+    messages = turns(10)
+    summary = "summary " * 100
+    budget = cost(messages[-4:]) + count_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+    _, with_summary = fit_history(messages, summary=summary, budget=budget)
+    _, without = fit_history(messages, budget=budget)
+    assert len(with_summary) == 4 and len(without) > 4
+
+def test_a_message_over_budget_overflows_everything_before_it():
+    messages = turns(6)
+    messages[3].content = "word " * 5000
+    overflow, window = fit_history(messages, budget=cost(messages[4:]) + 10)
+    assert window == messages[4:]
+    assert overflow == messages[:4]
+
+def test_split_recent_keeps_the_newest_within_the_limit():
+    messages = turns(8)
+    skipped, kept = split_recent(messages, cost(messages[-4:]))
+    assert skipped == messages[:4] and kept == messages[4:]
+
+def test_split_recent_never_splits_a_turn():
+    messages = turns(8)
+    # Room for three: the third would split a user/assistant pair that shares a timestamp
+    skipped, kept = split_recent(messages, cost(messages[-3:]))
+    assert kept == messages[-2:]
+
+def test_split_recent_uses_the_given_cost():
+    messages = turns(4)
+    messages[0].content = "word " * 5000
+    _, kept = split_recent(messages, 100, cost=lambda m: min(message_tokens(m), 20))
+    assert kept == messages
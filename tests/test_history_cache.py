@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from database.history_cache import CachedMessage, MemoryHistoryCache, RedisHistoryCache
+
+def message(content: str) -> CachedMessage:
+    return CachedMessage(uuid4(), "user", content, datetime.now())
+
+def redis_cache() -> RedisHistoryCache:
+    fakeredis = pytest.importorskip("fakeredis")
+    from redis.exceptions import WatchError
+
+    cache = RedisHistoryCache.__new__(RedisHistoryCache)
+    cache.client = fakeredis.FakeAsyncRedis()
+    cache.ttl = 600
+    cache.WatchError = WatchError
+    return cache
+
+@pytest.mark.parametrize("make_cache", [lambda: MemoryHistoryCache(10, 600), redis_cache], ids=["memory", "redis"])
+def test_a_load_racing_a_write_is_not_cached(make_cache):
+    cache = make_cache()
+    conversation_id = uuid4()
+
+    async def stale_loader():
+        await cache.append(conversation_id, [message("new turn")])
+        return [message("old")]
+
+    async def fresh_loader():
+        return [message("old"), message("new turn")]
+
+    async def run():
+        assert [m.content for m in await cache.get_or_load(conversation_id, stale_loader)] == ["old"]
+        return [m.content for m in await cache.get_or_load(conversation_id, fresh_loader)]
+
+    assert asyncio.run(run()) == ["old", "new turn"]
+
+@pytest.mark.parametrize("make_cache", [lambda: MemoryHistoryCache(10, 600), redis_cache], ids=["memory", "redis"])
+def test_appends_extend_a_cached_window(make_cache):
+    cache = make_cache()
+    conversation_id = uuid4()
+
+    async def loader():
+        return [message("first")]
+
+    async def run():
+        await cache.get_or_load(conversation_id, loader)
+        await cache.append(conversation_id, [message("second")])
+        return [m.content for m in await cache.get_or_load(conversation_id, loader)]
+
+    assert asyncio.run(run()) == ["first", "second"]
@@ -0,0 +1,71 @@
+import asyncio
+
+from AI.llm_scheduler import LLMScheduler, INTERACTIVE, BACKGROUND, _retry_after, _is_transient
+
+class Error(Exception):
+    def __init__(self, status_code: int, headers: dict | None = None):
+        super().__init__(status_code)
+        self.status_code = status_code
+        self.response = type("Response", (), {"status_code": status_code, "headers": headers or {}})()
+
+def admission_order(requests: list[tuple[str, int]]) -> list[str]:
+    """Queue every request before any is admitted, then record the order they run in"""
+    order = []
+
+    async def run():
+        scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=10**9)
+        # Empty bucket: nothing is admitted until every request has queued
+        scheduler.requests.level = 0
+
+        async def call(label):
+            order.append(label)
+
+        await asyncio.gather(*(
+            scheduler.run(lambda label=label: call(label), user=label[0], priority=priority, estimated_tokens=1)
+            for label, priority in requests
+        ))
+        scheduler.dispatcher.cancel()
+
+    asyncio.run(run())
+    return order
+
+def test_users_take_turns():
+    order = admission_order([("a1", INTERACTIVE), ("a2", INTERACTIVE), ("a3", INTERACTIVE), ("b1", INTERACTIVE), ("c1", INTERACTIVE)])
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+
+def test_interactive_calls_go_before_background_ones():
+    order = admission_order([("s1", BACKGROUND), ("s2", BACKGROUND), ("a1", INTERACTIVE), ("b1", INTERACTIVE)])
+    assert order == ["a1", "b1", "s1", "s2"]
+
+def test_retry_after_reads_rate_limit_headers():
+    assert _retry_after(Error(429, {"retry-after": "3"})) == 3.0
+    assert _retry_after(Error(429, {"retry-after-ms": "250"})) == 0.25
+    assert _retry_after(Error(503)) is None
+
+def test_transient_errors():
+    assert _is_transient(Error(503)) and _is_transient(Error(408)) and _is_transient(Error(409))
+    assert not _is_transient(Error(400)) and not _is_transient(Error(429))
+    assert not _is_transient(ValueError("bad"))
+
+def test_a_rate_limit_pauses_and_retries(monkeypatch):
+    import AI.llm_scheduler as llm_scheduler
+
+    monkeypatch.setattr(llm_scheduler, "LLM_RETRY_JITTER_SECONDS", 0.0)
+    attempts = 0
+
+    async def call():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise Error(429, {"retry-after-ms": "10"})
+        return "ok"
+
+    async def run():
+        scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=10**9)
+        result = await scheduler.run(call, user="u", priority=INTERACTIVE, estimated_tokens=1)
+        scheduler.dispatcher.cancel()
+        return result, scheduler.stats()
+
+    result, stats = asyncio.run(run())
+    assert result == "ok" and attempts == 2
+    assert stats["rate_limited"] == 1
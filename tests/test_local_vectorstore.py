@@ -0,0 +1,84 @@
+import os
+import json
+import asyncio
+import random
+
+import numpy as np
+from langchain_core.documents import Document
+
+from AI.vectorstore import LocalBackend
+
+def vector(seed: int) -> list[float]:
+    return np.random.default_rng(seed).standard_normal(8).tolist()
+
+def upsert(backend: LocalBackend, ids: list[str], seed: int = 0):
+    asyncio.run(backend.aupsert("ns", ids, [vector(seed + i) for i in range(len(ids))], [Document(page_content=f"{i}@{seed}") for i in ids]))
+
+def live(backend: LocalBackend) -> dict:
+    return {doc.id: doc.page_content for doc in backend.query("ns", vector(0), 10_000)}
+
+def test_query_ranks_by_cosine_similarity(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    asyncio.run(backend.aupsert("ns", ["near", "far"], [[1, 0, 0, 0, 0, 0, 0, 0], [0, 1, 0, 0, 0, 0, 0, 0]], [Document(page_content="n"), Document(page_content="f")]))
+    assert [doc.id for doc in backend.query("ns", [0.9, 0.1, 0, 0, 0, 0, 0, 0], 2)] == ["near", "far"]
+    assert backend.query("empty", vector(1), 3) == []
+
+def test_later_upserts_shadow_earlier_copies(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    upsert(backend, ["a", "b"], seed=1)
+    upsert(backend, ["b", "c"], seed=2)
+    assert live(backend) == {"a": "a@1", "b": "b@2", "c": "c@2"}
+
+def test_tombstones_hide_deleted_ids_until_they_are_upserted_again(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    upsert(backend, ["a", "b", "c"], seed=1)
+    asyncio.run(backend.adelete("ns", ["b"]))
+    assert set(live(backend)) == {"a", "c"}
+    upsert(backend, ["b"], seed=5)
+    assert live(backend)["b"] == "b@5"
+    assert asyncio.run(backend.alist_ids("ns", "")) == {"a", "b", "c"}
+
+def test_segments_merge_so_their_count_stays_logarithmic(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    for batch in range(64):
+        upsert(backend, [f"c{batch}-{i}" for i in range(4)], seed=batch)
+    manifest = json.load(open(tmp_path / "ns" / "manifest.json"))
+    assert len(manifest["segments"]) <= 7
+    assert len(live(backend)) == 256
+    # Merged-away segment files are removed
+    assert len(os.listdir(tmp_path / "ns")) == 2 * len(manifest["segments"]) + 2
+
+def test_matches_a_reference_under_random_operations(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    rng = random.Random(7)
+    expected = {}
+    for step in range(150):
+        if rng.random() < 0.7 or not expected:
+            ids = list(dict.fromkeys(f"d{rng.randint(0, 200)}" for _ in range(rng.randint(1, 8))))
+            upsert(backend, ids, seed=step)
+            expected.update({i: f"{i}@{step}" for i in ids})
+        else:
+            ids = rng.sample(sorted(expected), min(len(expected), 4))
+            asyncio.run(backend.adelete("ns", ids))
+            for i in ids:
+                expected.pop(i)
+        assert live(LocalBackend(str(tmp_path))) == expected
+
+def test_writes_from_another_instance_are_seen(tmp_path):
+    reader, writer = LocalBackend(str(tmp_path)), LocalBackend(str(tmp_path))
+    upsert(writer, ["a"])
+    assert set(live(reader)) == {"a"}
+    upsert(writer, ["b"])
+    assert set(live(reader)) == {"a", "b"}
+    writer.clear("ns")
+    assert live(reader) == {}
+
+def test_reads_the_single_file_layout(tmp_path):
+    os.makedirs(tmp_path / "ns")
+    np.save(tmp_path / "ns" / "vectors.npy", np.asarray([vector(1)], dtype=np.float32))
+    with open(tmp_path / "ns" / "records.json", "w") as f:
+        json.dump([{"id": "old", "text": "t", "metadata": {}}], f)
+    backend = LocalBackend(str(tmp_path))
+    assert live(backend) == {"old": "t"}
+    upsert(backend, ["new"])
+    assert set(live(backend)) == {"old", "new"}
@@ -0,0 +1,44 @@
+import os
+import asyncio
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="needs a migrated Postgres in DATABASE_URL")
+
+# The index each hot table must be read through
+EXPECTED_INDEXES = {
+    "ix_messages_conversation_created",
+    "ix_conversations_user_created",
+    "ix_ingestion_jobs_document_latest",
+    "ix_refresh_tokens_token_hash_live",
+    "ix_otp_verifications_email_pending",
+}
+# Primary keys are fine for single-row lookups
+ALLOWED_INDEXES = EXPECTED_INDEXES | {"conversations_pkey", "ingestion_jobs_pkey", "users_pkey"}
+
+@pytest.fixture(scope="module")
+def plans():
+    from benchmarks.explain_hot_queries import collect_plans
+    from database.initializations import engine
+
+    async def run():
+        try:
+            return await collect_plans()
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+def test_no_hot_query_needs_a_sequential_scan(plans):
+    from benchmarks.explain_hot_queries import seq_scans
+
+    assert plans
+    offenders = [(" ".join(statement.split())[:120], seq_scans(plan)) for statement, plan in plans if seq_scans(plan)]
+    assert offenders == []
+
+def test_hot_queries_use_the_expected_indexes(plans):
+    from benchmarks.explain_hot_queries import index_names
+
+    used = {name for _, plan in plans for name in index_names(plan)}
+    assert EXPECTED_INDEXES <= used
+    assert used <= ALLOWED_INDEXES
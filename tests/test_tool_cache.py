@@ -0,0 +1,50 @@
+import asyncio
+
+from AI.tool_cache import ToolCache, cache_key
+
+def test_query_ignores_case_and_spacing():
+    assert cache_key({"query": "  Latest   GPU prices "}) == cache_key({"query": "latest gpu prices"})
+
+def test_other_arguments_keep_their_case():
+    assert cache_key({"instructions": "Find Pricing"}) != cache_key({"instructions": "find pricing"})
+    assert cache_key({"select_paths": ["/Docs/.*"]}) != cache_key({"select_paths": ["/docs/.*"]})
+
+def test_urls_only_fold_scheme_and_host():
+    assert cache_key({"url": "HTTPS://Example.COM/Pricing/"}) == cache_key({"url": "https://example.com/Pricing"})
+    assert cache_key({"url": "https://example.com/Pricing"}) != cache_key({"url": "https://example.com/pricing"})
+
+def test_argument_order_and_none_values_do_not_matter():
+    assert cache_key({"query": "x", "max_results": 5, "topic": None}) == cache_key({"max_results": 5, "query": "x"})
+
+def test_concurrent_identical_calls_share_one_fetch():
+    cache = ToolCache("search", ttl=60, max_size=10, estimated_credits=1)
+    fetches = 0
+
+    async def fetch():
+        nonlocal fetches
+        fetches += 1
+        await asyncio.sleep(0.01)
+        return {"results": []}
+
+    async def run():
+        results = await asyncio.gather(*(cache.get("k", fetch) for _ in range(5)))
+        results.append(await cache.get("k", fetch))
+        return results
+
+    results = asyncio.run(run())
+    assert fetches == 1
+    assert all(result == {"results": []} for result in results)
+    assert cache.stats()["coalesced"] == 4 and cache.stats()["hits"] == 1
+
+def test_error_results_are_not_cached():
+    cache = ToolCache("search", ttl=60, max_size=10, estimated_credits=1)
+
+    async def fetch():
+        return {"error": "upstream down"}
+
+    async def run():
+        await cache.get("k", fetch)
+        await cache.get("k", fetch)
+
+    asyncio.run(run())
+    assert cache.stats()["calls"] == 2 and cache.stats()["errors"] == 2
@@ -0,0 +1,38 @@
+import utils.cache as cache_module
+from utils.cache import TTLCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    cache = TTLCache(max_size=10, ttl=5)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=20)
+    clock.now += 6
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert "a" not in cache.entries
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+def test_invalidate_and_stats():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 1, "hit_rate": 0.5}
@@ -2,9 +2,10 @@
 from datetime import datetime, timedelta, timezone
 import secrets
 import hashlib
+from dataclasses import dataclass
+
+import asyncio
 
-from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
 from jose import jwt
 
 from fastapi import Depends, HTTPException
@@ -14,29 +15,41 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from uuid import UUID  
 
-from utils.config import ACCESS_TOKEN_EXPIRE_HOURS, SECRET_KEY, ALGORITHM, REFRESH_TOKEN_EXPIRE_DAYS
+from utils.config import ACCESS_TOKEN_EXPIRE_HOURS, SECRET_KEY, ALGORITHM, REFRESH_TOKEN_EXPIRE_DAYS, USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS, AUTH_TRUST_CLAIMS_FOR_READS
+from utils.cache import TTLCache
+from utils.passwords import executor as password_executor, hash_password_sync, verify_password_sync
 from database.initializations import get_db, UserModel, RefreshTokenModel
 
-ph = PasswordHasher()
 security = HTTPBearer()
 
+@dataclass(frozen=True)
+class UserPrincipal:
+    """The authenticated user as routes see it; safe to share across requests"""
+    id: UUID
+    email: str
+
+user_cache = TTLCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+def invalidate_cached_user(user_id: UUID):
+    user_cache.invalidate(user_id)
+
 def hash_refresh_token(token: str) -> str:
     return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
-def hash_password(password: str) -> str:
-    return ph.hash(password)
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(password_executor, hash_password_sync, password)
 
-def verify_password(hashed_password: str, plain_password: str) -> bool:
-    try:
-        ph.verify(hashed_password, plain_password)
-        return True
-    except VerifyMismatchError:
-        return False
+async def verify_password(hashed_password: str, plain_password: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(
+        password_executor, verify_password_sync, hashed_password, plain_password
+    )
 
-async def create_tokens(user_id: UUID, db: AsyncSession) -> dict:  # Changed to UUID
+async def create_tokens(user_id: UUID, db: AsyncSession, email: str | None = None) -> dict:  # Changed to UUID
     # Create access token
     expire = datetime.now(tz=timezone.utc) + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
     to_encode = {"sub": str(user_id), "exp": expire}
+    if email:
+        to_encode["email"] = email
     access_token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     
     # Create refresh token
@@ -59,26 +72,44 @@ async def create_tokens(user_id: UUID, db: AsyncSession) -> dict:  # Changed to
         "token_type": "bearer"
     }
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
-) -> UserModel:
-    token = credentials.credentials
-
+def _decode_access_token(token: str) -> dict:
     try: 
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         # Remove this check - you're not adding "type" to token
         # if payload.get("type") != "access":
         #     raise HTTPException(status_code=401, detail="Invalid token type")
-        user_id = UUID(payload["sub"])  # Convert string to UUID
+        payload["sub"] = UUID(payload["sub"])  # Convert string to UUID
+        return payload
 
     except Exception:  # Catch all exceptions
         raise HTTPException(status_code=401, detail="Invalid token")
-    
-    result = await db.execute(select(UserModel).where(UserModel.id == user_id))
-    user = result.scalar_one_or_none()
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> UserPrincipal:
+    user_id = _decode_access_token(credentials.credentials)["sub"]
+
+    principal = user_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(select(UserModel.id, UserModel.email).where(UserModel.id == user_id))
+    user = result.one_or_none()
     
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return user
\ No newline at end of file
+    principal = UserPrincipal(id=user.id, email=user.email)
+    user_cache.set(user_id, principal)
+    return principal
+
+async def get_read_only_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> UserPrincipal:
+    """For read-only routes: optionally trust the signed claims and skip the user lookup"""
+    if AUTH_TRUST_CLAIMS_FOR_READS:
+        payload = _decode_access_token(credentials.credentials)
+        return UserPrincipal(id=payload["sub"], email=payload.get("email", ""))
+    return await get_current_user(credentials, db)
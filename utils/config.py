@@ -6,26 +6,101 @@ from langchain_ollama import OllamaEmbeddings
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_SSL = os.getenv("DB_SSL", "require")  # "disable" for a local Postgres without TLS
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"  # Supabase pooler / PgBouncer transaction mode
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 COHERE_API_KEY = os.getenv("COHERE_API_KEY")
 
+WARMUP_DB_CONNECTIONS = 5
+
 SECRET_KEY = os.getenv("SECRET_KEY", "change-this-secret-key-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24
 REFRESH_TOKEN_EXPIRE_DAYS = 30
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # "thread" or "process"
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL_SECONDS = 60
+AUTH_TRUST_CLAIMS_FOR_READS = os.getenv("AUTH_TRUST_CLAIMS_FOR_READS", "false").lower() == "true"
 
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")  # "pinecone" or "local"
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "vector_store")
 INDEX_NAME = "chatbot-wrapper-backend"
 EMBEDDING_MODEL = OllamaEmbeddings(model="nomic-embed-text:v1.5 ")
+EMBEDDING_CACHE_SIZE = 10000
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
 DIMENSIONS = 768
 CHUNK_SIZE = 400
 CHUNK_OVERLAP = 75
 SEPARATORS = ["\n\n", "\n", ".", ",", " ", ""]
+INGEST_BATCH_SIZE = 64
+INGEST_CONCURRENCY = 4
+INGEST_MAX_RETRIES = 3
+INGEST_RETRY_BASE_DELAY = 0.5
+INGEST_WORKERS = 2
+INGEST_QUEUE_SIZE = 32
+INGEST_HEARTBEAT_SECONDS = 15  # how often each process reports it is alive and sweeps dead workers' jobs
+INGEST_WORKER_STALE_SECONDS = 60  # a process silent this long is dead; its queued and running jobs are failed
 BASE_K = 20
 TOP_N = 5
 USE_RERANKING = False
 RERANK_MODEL = "ms-marco-MiniLM-L-12-v2"
+RERANK_WORKERS = 1
+RERANK_BATCH_WINDOW_MS = 5
+RERANK_MAX_BATCH_PAIRS = 128
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))  # history + summary + new message
+CONTEXT_MAX_MESSAGES = 100  # most messages ever loaded for one turn
+TOKENIZER_ENCODING = "cl100k_base"
+SUMMARY_TRIGGER_MESSAGES = 6  # fold once this many messages fall outside the budget
+SUMMARY_PENDING_TOKENS = CONTEXT_TOKEN_BUDGET // 4  # overflow still kept in the prompt until summarized; past it a refresh starts at once
+SUMMARY_CHUNK_TOKENS = 4000  # most message tokens sent in one summarization call
+SUMMARY_REFRESH_MAX_TOKENS = 3 * SUMMARY_CHUNK_TOKENS  # most overflow folded per refresh; anything older is skipped
+SUMMARY_MESSAGE_MAX_TOKENS = 1000  # a longer message (a pasted document) is cut to this for summarization
+HISTORY_CACHE_BACKEND = os.getenv("HISTORY_CACHE_BACKEND", "memory")  # "memory" or "redis" (shared across workers)
+HISTORY_CACHE_SIZE = 2000  # conversations
+HISTORY_CACHE_TTL_SECONDS = 600
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))  # uvicorn worker count when set through the environment
+TOOL_CACHE_TTL_SECONDS = {
+    "tavily_search": 900,
+    "tavily_extract": 6 * 3600,
+    "tavily_crawl": 6 * 3600,
+    "tavily_map": 12 * 3600,
+}
+TOOL_CACHE_SIZE = {"tavily_search": 2000, "tavily_extract": 500, "tavily_crawl": 200, "tavily_map": 200}
+# Used for spend metrics only when a response carries no usage block
+TAVILY_ESTIMATED_CREDITS = {"tavily_search": 2, "tavily_extract": 2, "tavily_crawl": 4, "tavily_map": 2}
+TOOL_TIMEOUT_SECONDS = {"tavily_search": 15, "tavily_extract": 20, "tavily_crawl": 30, "tavily_map": 25, "query_rag": 10}
+DEFAULT_TOOL_TIMEOUT_SECONDS = 10
+CIRCUIT_FAILURE_THRESHOLD = 3  # consecutive failures before a tool is dropped
+CIRCUIT_RESET_SECONDS = 60  # how long it stays dropped before a trial call
+AGENT_TURN_TIMEOUT_SECONDS = float(os.getenv("AGENT_TURN_TIMEOUT_SECONDS", "60"))
+AGENT_FALLBACK_TIMEOUT_SECONDS = 20  # tool-less answer after the agent fails or runs out of time
+# Set these to your Groq tier's limits for the chat model
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "1000"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "250000"))
+LLM_OUTPUT_TOKEN_ESTIMATE = 1024  # reserved per call until the real usage is known
+LLM_MAX_RETRIES = 3  # retries after a 429, timeout, connection error or 5xx
+LLM_RETRY_BASE_DELAY = 1.0  # back-off when a 429 carries no Retry-After; doubles per attempt for transient errors
+LLM_RETRY_JITTER_SECONDS = 1.0
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "jsonl")  # "jsonl" or "none"
+TRACE_FILE = os.getenv("TRACE_FILE", "traces/spans.jsonl")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))  # share of requests traced
+# Follow the sampled flag of an inbound traceparent; only behind a trusted proxy that sets or strips the header,
+# otherwise any client could force every request to be traced
+TRACE_HONOR_INBOUND_SAMPLING = os.getenv("TRACE_HONOR_INBOUND_SAMPLING", "false").lower() == "true"
+TRACE_BUFFER_SPANS = 200  # spans held in memory before a write, at most
 
 SMTP_EMAIL = os.getenv("SMTP_EMAIL")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
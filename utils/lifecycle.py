@@ -0,0 +1,50 @@
+
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from database.initializations import engine
+from AI.bot import get_agent
+from AI.context import count_tokens
+from AI.embeddings import embeddings
+from AI.rerank import warm_reranker
+from AI.vectorstore import get_vector_backend
+from utils.config import USE_RERANKING, WARMUP_DB_CONNECTIONS
+
+readiness = {"ready": False, "error": None, "warmup_seconds": None}
+
+async def _prime_db():
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # Hold several connections at once so the pool really opens that many
+    await asyncio.gather(*(ping() for _ in range(WARMUP_DB_CONNECTIONS)))
+
+async def _probe_embedding():
+    # Bypass the cache so the embedding model itself gets loaded
+    await embeddings.underlying.aembed_query("warmup")
+
+async def warmup():
+    """Build clients and prime dependencies in parallel, then flip readiness"""
+    started = time.perf_counter()
+    steps = [
+        _prime_db(),
+        _probe_embedding(),
+        asyncio.to_thread(get_agent),
+        asyncio.to_thread(get_vector_backend),
+        # Loads (and on first run downloads) the tokenizer tables
+        asyncio.to_thread(count_tokens, "warmup"),
+    ]
+    if USE_RERANKING:
+        steps.append(asyncio.to_thread(warm_reranker))
+
+    try:
+        await asyncio.gather(*steps)
+    except Exception as e:
+        readiness["error"] = repr(e)
+        print("Warmup failed:", repr(e))
+        return
+    readiness["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    readiness["ready"] = True
@@ -0,0 +1,108 @@
+
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+# Labels only ever take values from small fixed sets (route templates, tool names, stages);
+# user and conversation ids never become labels, so series count stays bounded.
+
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route template",
+    ["method", "route", "status"], buckets=SLOW_BUCKETS
+)
+CHAT_TURN_SECONDS = Histogram(
+    "chat_turn_duration_seconds", "Whole chat turn including streaming, context load to saved reply",
+    ["mode", "outcome"], buckets=SLOW_BUCKETS
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Database statement time, by statement type",
+    ["statement"], buckets=FAST_BUCKETS
+)
+HISTORY_LOAD_SECONDS = Histogram(
+    "chat_history_load_duration_seconds", "Loading a conversation and its recent history",
+    ["cache"], buckets=FAST_BUCKETS
+)
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_duration_seconds", "One LLM request, excluding time queued in the scheduler",
+    ["kind", "outcome"], buckets=SLOW_BUCKETS
+)
+LLM_QUEUE_SECONDS = Histogram(
+    "llm_queue_wait_seconds", "Time an LLM call waited for rate budget",
+    ["priority"], buckets=SLOW_BUCKETS
+)
+LLM_TOKENS = Counter("llm_tokens", "Tokens reported by the provider", ["kind"])
+TOOL_CALL_SECONDS = Histogram(
+    "tool_call_duration_seconds", "Agent tool call time, by tool",
+    ["tool", "outcome"], buckets=SLOW_BUCKETS
+)
+EMBEDDING_SECONDS = Histogram(
+    "embedding_duration_seconds", "Embedding model calls for texts missing from the cache",
+    ["operation"], buckets=SLOW_BUCKETS
+)
+VECTOR_SEARCH_SECONDS = Histogram(
+    "vector_search_duration_seconds", "Vector store similarity queries",
+    ["backend"], buckets=FAST_BUCKETS
+)
+INGESTED_CHUNKS = Counter("ingestion_chunks", "Document chunks processed by ingestion", ["result"])
+INGESTION_JOBS = Counter("ingestion_jobs", "Finished ingestion jobs", ["state"])
+INGESTION_JOB_SECONDS = Histogram(
+    "ingestion_job_duration_seconds", "Whole ingestion job time",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+
+@contextmanager
+def timed(histogram: Histogram, with_outcome: bool = False, **labels):
+    """Observe the block's duration; with_outcome adds an `outcome` label of ok or error"""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        if with_outcome:
+            labels["outcome"] = outcome
+        histogram.labels(**labels).observe(time.perf_counter() - started)
+
+_stats_sources = []
+
+def register_stats(name: str, documentation: str, source, label: str | None = None):
+    """Export the numeric values of source() as gauges named name_<key>, read at scrape time.
+    With label set, source() returns {label value: {key: value}} instead."""
+    _stats_sources.append((name, documentation, source, label))
+
+class _StatsCollector:
+    def collect(self):
+        for name, documentation, source, label in _stats_sources:
+            try:
+                stats = source()
+            except Exception as e:
+                print(f"Metrics source {name} failed: {e!r}")
+                continue
+            rows = stats.items() if label else [(None, stats)]
+            families = {}
+            for label_value, values in rows:
+                for key, value in values.items():
+                    # Booleans and strings (states) are left to /stats
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        continue
+                    if key not in families:
+                        families[key] = GaugeMetricFamily(
+                            f"{name}_{key}", documentation, labels=[label] if label else None
+                        )
+                    if label:
+                        families[key].add_metric([str(label_value)], value)
+                    else:
+                        families[key].add_metric([], value)
+            yield from families.values()
+
+REGISTRY.register(_StatsCollector())
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
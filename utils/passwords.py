@@ -0,0 +1,29 @@
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError
+
+from utils.config import ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM, PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS
+
+ph = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM
+)
+
+# Argon2 is deliberately slow; a small dedicated pool keeps it off the event loop and caps its CPU share
+if PASSWORD_HASH_EXECUTOR == "process":
+    executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+else:
+    executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="argon2")
+
+def hash_password_sync(password: str) -> str:
+    return ph.hash(password)
+
+def verify_password_sync(hashed_password: str, plain_password: str) -> bool:
+    try:
+        ph.verify(hashed_password, plain_password)
+        return True
+    except VerifyMismatchError:
+        return False
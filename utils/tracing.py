@@ -0,0 +1,207 @@
+
+import os
+import json
+import time
+import queue
+import random
+import threading
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from contextlib import contextmanager
+from functools import lru_cache
+
+from utils.config import TRACE_EXPORTER, TRACE_FILE, TRACE_SAMPLE_RATE, TRACE_BUFFER_SPANS, TRACE_HONOR_INBOUND_SAMPLING
+
+# The innermost open span of the current request or task; None when untraced or not sampled.
+# asyncio tasks and to_thread copy it, so child work joins its caller's trace.
+_current = ContextVar("current_span", default=None)
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "started", "started_at", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self, duration: float) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.started_at,
+            "duration_ms": round(duration * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, span: dict):
+        ...
+
+    def flush(self):
+        pass
+
+    def shutdown(self):
+        """Flush and wait until everything exported so far is written"""
+        self.flush()
+
+class NullExporter(SpanExporter):
+    def export(self, span):
+        pass
+
+class JsonlExporter(SpanExporter):
+    """Appends one JSON object per span to a local file; lines are buffered per trace
+    and written by a background thread, so file I/O never runs on the event loop"""
+
+    def __init__(self, path: str, buffer_spans: int):
+        self.path = path
+        self.buffer_spans = buffer_spans
+        self.lines = []
+        self.lock = threading.Lock()
+        self.pending = queue.Queue()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        threading.Thread(target=self._write_forever, name="span-writer", daemon=True).start()
+
+    def _write_forever(self):
+        while True:
+            lines = self.pending.get()
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError as e:
+                print(f"Span export failed: {e!r}")
+            finally:
+                self.pending.task_done()
+
+    def export(self, span):
+        line = json.dumps(span, default=str)
+        with self.lock:
+            self.lines.append(line)
+            full = len(self.lines) >= self.buffer_spans
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            lines, self.lines = self.lines, []
+        if lines:
+            self.pending.put(lines)
+
+    def shutdown(self):
+        self.flush()
+        self.pending.join()
+
+@lru_cache
+def get_span_exporter() -> SpanExporter:
+    if TRACE_EXPORTER == "jsonl":
+        return JsonlExporter(TRACE_FILE, TRACE_BUFFER_SPANS)
+    if TRACE_EXPORTER == "none":
+        return NullExporter()
+    raise ValueError(f"Unknown TRACE_EXPORTER: {TRACE_EXPORTER}")
+
+def _finish(span: Span, error: BaseException | None = None):
+    if error is not None:
+        span.status = "error"
+        span.error = repr(error)
+    get_span_exporter().export(span.to_dict(time.perf_counter() - span.started))
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """(trace id, parent span id, sampled) from a W3C traceparent header"""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+def current_trace_id() -> str | None:
+    """Id of the sampled trace in progress, to hand to work that runs outside this context"""
+    current = _current.get()
+    return current.trace_id if current is not None else None
+
+@contextmanager
+def trace(name: str, traceparent: str | None = None, triggered_by: str | None = None, **attributes):
+    """Start a trace, continuing the caller's when a traceparent header is given.
+    Work started by a sampled trace (the current one, or triggered_by for work handed over a queue)
+    is always sampled and linked back. Yields the root span, or None when this trace is not sampled."""
+    incoming = parse_traceparent(traceparent)
+    triggered_by = triggered_by or current_trace_id()
+    if incoming is not None:
+        trace_id, parent_id, sampled = incoming
+        if not TRACE_HONOR_INBOUND_SAMPLING:
+            sampled = random.random() < TRACE_SAMPLE_RATE
+    elif triggered_by is not None:
+        # Background work started by a sampled trace gets its own trace, linked back
+        trace_id, parent_id, sampled = _new_id(128), None, True
+        attributes["triggered_by"] = triggered_by
+    else:
+        trace_id, parent_id, sampled = _new_id(128), None, random.random() < TRACE_SAMPLE_RATE
+    if not sampled:
+        token = _current.set(None)
+        try:
+            yield None
+        finally:
+            _current.reset(token)
+        return
+
+    root = Span(name, trace_id, parent_id, attributes)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        _finish(root, e)
+        raise
+    else:
+        _finish(root)
+    finally:
+        _current.reset(token)
+        get_span_exporter().flush()
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child of the current span; costs next to nothing when the trace is not sampled"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, parent.span_id, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        _finish(child, e)
+        raise
+    else:
+        _finish(child)
+    finally:
+        _current.reset(token)
+
+def start_span(name: str, **attributes) -> Span | None:
+    """A leaf span ended with end_span, for callbacks that cannot wrap a block"""
+    parent = _current.get()
+    if parent is None:
+        return None
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+def end_span(span: Span | None, error: BaseException | None = None):
+    if span is not None:
+        _finish(span, error)